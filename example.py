@@ -12,18 +12,22 @@ def image_name(filepath):
     """
     Get a name for the image from the file path (models/ABC/abc.xml -> abc.png).
     """
-    file_name = os.path.basename(filepath)
-    return image_folder + file_name[:-4] + '.png'
+    file_name = os.path.basename(os.path.normpath(filepath))
+    return image_folder + os.path.splitext(file_name)[0] + '.png'
 
 
 def analyze_fault_tree(filepath, m=1, method='classical'):
     """
-    Compute `m` cutsets from the given fault tree (as XML file).
+    Compute `m` cutsets from the given fault tree (as XML file, or directory
+    of XML files).
     """
 
     # load the fault tree
     print(f"Loading {filepath}... ", end='')
-    ft = FaultTree.load_from_xml(filepath)
+    if os.path.isdir(filepath):
+        ft = FaultTree.load_from_files(filepath)
+    else:
+        ft = FaultTree.load_from_xml(filepath)
     print(f"(has {ft.number_of_nodes()} nodes)")
 
     # vizualize
@@ -38,11 +42,12 @@ def analyze_fault_tree(filepath, m=1, method='classical'):
 if __name__ == '__main__':
     Path(image_folder).mkdir(parents=True, exist_ok=True)
 
-    # Analyze FTs (not all FTs can be loaded because they have e.g. this
-    # <!-- Transfer-In --> thing which the current parser doesn't deal with)
+    # Analyze FTs (FTs which are split over several files, e.g. with
+    # <!-- Transfer-In --> gates, are loaded from their directory)
     analyze_fault_tree('models/Theatre/theatre.xml', m=2)
     analyze_fault_tree('models/Theatre/theatre.xml', m=2, method='grover')
     analyze_fault_tree('models/SmallTree/SmallTree.xml', m=2)
     analyze_fault_tree('models/BSCU/BSCU.xml', m=3)
     analyze_fault_tree('models/Lift/lift.xml', m=5)
     analyze_fault_tree('models/Lift/lift.xml', m=5, method='min-sat')
+    analyze_fault_tree('models/TransTest/', m=2)
@@ -0,0 +1,275 @@
+"""
+Boolean formulas given as circuits over a set of input variables, for Grover
+search over the inputs only. In the CNF of a fault tree every gate (and every
+auxiliary variable of a cardinality constraint) is a variable, and so a
+qubit of the search register. A CircuitFormula instead keeps the gates as a
+circuit, whose outputs the oracle computes reversibly on ancillas, so the
+search register only holds the basic events.
+"""
+import numpy as np
+
+import ft_2_quantum_sat.myqlm_functions as myqlm
+from ft_2_quantum_sat import grover
+from ft_2_quantum_sat.preprocessing import gates_bottom_up
+
+
+class CircuitFormula:
+    """
+    A formula over the input variables 1, ..., num_inputs, which is True iff
+    all `outputs` of a circuit of gates are True, and none of the `blocked`
+    sets of variables are all True. Lines of the circuit are
+    numbered like CNF variables: the inputs first, then the output of every
+    gate, in order. Gates only use earlier lines.
+
+    The methods used to enumerate cut sets (copy(), block_positive_only(),
+    add_cardinality_constraint(), solve(), ...) work as those of CNF, so a
+    CircuitFormula can be used in its place with the 'grover' method.
+    """
+
+    def __init__(self, num_inputs=0):
+        self.num_inputs = num_inputs
+        self.var_names = {} # map: input var -> name
+        self.gates = [] # (gate type, input literals, k)
+        self.outputs = [] # literals which have to be True
+        self.blocked = [] # variables blocked by block_positive_only()
+
+
+    @classmethod
+    def from_fault_tree(cls, ft, top_event=None):
+        """
+        Creates the circuit of the cone of influence of the top event of a
+        fault tree, with the basic events as inputs.
+
+        Returns:
+            A tuple (formula, input_vars), with input_vars a map from basic
+            event name to input variable.
+        """
+        top = top_event if top_event is not None else ft.top_event
+        top = ft.aliases.get(top, top)
+        f = cls()
+        if top in ft.constants:
+            f.outputs.append(f.add_gate('and' if ft.constants[top] else 'or',
+                                        []))
+            return f, {}
+
+        cone = ft.cone_of_influence(top)
+        input_vars = {}
+        for node in ft.graph.nodes:
+            if node in cone and ft.node_types[node] == 'input':
+                f.num_inputs += 1
+                input_vars[node] = f.num_inputs
+                f.var_names[f.num_inputs] = node
+
+        lines = dict(input_vars)
+        for node in gates_bottom_up(ft, cone):
+            node_type = ft.node_types[node]
+            if node_type == 'house':
+                # constant True (False) is an AND (OR) without inputs
+                lines[node] = f.add_gate(
+                    'and' if ft.house_events[node] else 'or', [])
+            else:
+                lines[node] = f.add_gate(
+                    node_type, [lines[i] for i in ft.get_gate_inputs(node)],
+                    ft.thresholds.get(node))
+        f.outputs.append(lines[top])
+        return f, input_vars
+
+
+    @property
+    def num_vars(self):
+        """
+        The number of variables searched over, i.e. the number of inputs.
+        """
+        return self.num_inputs
+
+
+    def copy(self):
+        """
+        Return a copy of self.
+        """
+        f = CircuitFormula(self.num_inputs)
+        f.var_names = self.var_names.copy()
+        f.gates = list(self.gates)
+        f.outputs = list(self.outputs)
+        f.blocked = list(self.blocked)
+        return f
+
+
+    def get_vars(self):
+        """
+        Get all the (input) variables as a list.
+        """
+        return list(range(1, self.num_inputs + 1))
+
+
+    def add_gate(self, gate_type, inputs, k=None):
+        """
+        Adds a gate over earlier lines of the circuit.
+
+        Args:
+            gate_type: One of 'and', 'or', 'not', 'atleast' and 'atmost'.
+            inputs: The input literals of the gate.
+            k: The threshold of 'atleast' and 'atmost' gates.
+
+        Returns:
+            The line of the output of the gate.
+        """
+        self.gates.append((gate_type, list(inputs), k))
+        return self.num_inputs + len(self.gates)
+
+
+    def add_cardinality_constraint(self, at_most, variables=None):
+        """
+        Requires at most `at_most` of the given (by default all) variables to
+        be True.
+        """
+        if variables is None:
+            variables = self.get_vars()
+        self.outputs.append(self.add_gate('atmost', variables, at_most))
+
+
+    def block_positive_only(self, a):
+        """
+        Blocks the given (partial) assignment and all assignments in which
+        (at least) the same variables are True.
+        """
+        block = tuple(lit for lit in a if lit > 0)
+        if len(block) > 0:
+            self.blocked.append(block)
+
+
+    def evaluate(self, assignment):
+        """
+        Evaluates the circuit classically for an assignment to the inputs (a
+        list of literals).
+
+        Returns:
+            The values of all lines, indexed by line (index 0 is unused).
+        """
+        values = [False] * (self.num_inputs + len(self.gates) + 1)
+        for lit in assignment:
+            values[abs(lit)] = lit > 0
+
+        def value(lit):
+            return values[lit] if lit > 0 else not values[-lit]
+
+        for i, (gate_type, lits, k) in enumerate(self.gates):
+            line = self.num_inputs + i + 1
+            if gate_type == 'and':
+                values[line] = all(value(lit) for lit in lits)
+            elif gate_type == 'or':
+                values[line] = any(value(lit) for lit in lits)
+            elif gate_type == 'not':
+                values[line] = not value(lits[0])
+            elif gate_type == 'atleast':
+                values[line] = sum(value(lit) for lit in lits) >= k
+            elif gate_type == 'atmost':
+                values[line] = sum(value(lit) for lit in lits) <= k
+            else:
+                raise ValueError(f"Gate type '{gate_type}' not supported")
+        return values
+
+
+    def is_satisfying(self, assignment):
+        """
+        Checks whether the given assignment to the inputs satisfies the
+        formula.
+        """
+        values = self.evaluate(assignment)
+        return all(values[lit] if lit > 0 else not values[-lit]
+                   for lit in self.outputs) and \
+            not any(all(values[var] for var in block) for block in self.blocked)
+
+
+    def satisfying_mask(self, max_vars=grover.MAX_MASK_VARS):
+        """
+        Evaluates the formula for all 2^n assignments to the inputs at once,
+        see CNF.satisfying_mask().
+        """
+        grover.check_mask_size(self.num_inputs, max_vars)
+        indices = np.arange(2**self.num_inputs, dtype=np.int64)
+        values = [None] + [(indices >> (var - 1)) & 1 == 1
+                           for var in self.get_vars()]
+
+        def value(lit):
+            return values[lit] if lit > 0 else ~values[-lit]
+
+        def count(lits):
+            return sum((value(lit).astype(np.int64) for lit in lits),
+                       np.zeros(indices.size, dtype=np.int64))
+
+        true = np.ones(indices.size, dtype=bool)
+        for gate_type, lits, k in self.gates:
+            if gate_type == 'and':
+                values.append(np.logical_and.reduce(
+                    [true] + [value(lit) for lit in lits]))
+            elif gate_type == 'or':
+                values.append(np.logical_or.reduce(
+                    [~true] + [value(lit) for lit in lits]))
+            elif gate_type == 'not':
+                values.append(~value(lits[0]))
+            elif gate_type == 'atleast':
+                values.append(count(lits) >= k)
+            elif gate_type == 'atmost':
+                values.append(count(lits) <= k)
+            else:
+                raise ValueError(f"Gate type '{gate_type}' not supported")
+
+        mask = true.copy()
+        for lit in self.outputs:
+            mask &= value(lit)
+        for block in self.blocked:
+            mask &= ~np.logical_and.reduce([values[var] for var in block])
+        return mask
+
+
+    def assignment_to_set(self, assignment):
+        """
+        Returns the set of names of the input variables set to True in the
+        given assignment.
+        """
+        return {self.var_names[lit] for lit in assignment if lit > 0}
+
+
+    def assignments_to_sets(self, assignments):
+        """
+        Applies assignment_to_set() to every assignment in the given list.
+        """
+        return [self.assignment_to_set(a) for a in assignments]
+
+
+    def solve(self, method='grover', minimize_vars=None, verbose=True, *,
+              budget=None, backend=None, batch_size=None, reuse_ancillas=None):
+        """
+        Gets 1 satisfying assignment if it exists, with Grover search over the
+        input variables (see CNF.solve()). The oracle of a circuit is not
+        batched, so `batch_size` and `reuse_ancillas` are ignored.
+
+        Returns:
+            A tuple (sat, model), with sat None if the budget ran out.
+        """
+        # pylint: disable=unused-argument
+        if method != 'grover':
+            raise ValueError("Circuit formulas can only be solved with the "
+                             "'grover' method")
+        if budget is not None and budget.expired():
+            return None, None
+        assignment = grover.grover_search(self, backend, verbose=verbose)
+        if assignment is None:
+            return False, None
+        return True, assignment
+
+
+    def grover_circuits(self):
+        """
+        Returns the (cached) myqlm_functions.GroverCircuits of this formula,
+        see CNF.grover_circuits().
+        """
+        key = ('circuit', tuple((gate_type, tuple(lits), k)
+                                for gate_type, lits, k in self.gates),
+               tuple(self.outputs))
+        oracle = myqlm.get_incremental_oracle(
+            self.num_inputs, key,
+            lambda: myqlm.circuit_routine(self.num_inputs, self.gates,
+                                          self.outputs))
+        return oracle.circuits(self.blocked)
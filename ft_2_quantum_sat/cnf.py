@@ -2,18 +2,113 @@
 Definition of CNF class to hold some custom CNF functionality (the CNF class in
 pysat.formula doesn't quite do everyting we need).
 """
-import math
-import random
+from array import array
 
+import numpy as np
 from pysat.solvers import Glucose3
 from pysat.card import CardEnc
 from pysat.examples.rc2 import RC2
 from pysat.formula import WCNF
 
-from qat.lang.AQASM import Program, H
-from qat.qpus import get_default_qpu
-
 import ft_2_quantum_sat.myqlm_functions as myqlm
+from ft_2_quantum_sat import grover
+
+
+class ClauseStore:
+    """
+    Compact, append-only storage for CNF clauses. The literals of all clauses
+    are kept in one flat int32 buffer, and a second buffer holds the offset
+    at which each clause starts, so a clause costs 8 bytes plus 4 bytes per
+    literal instead of a frozenset object.
+
+    Copies share their buffers with the original (copy-on-write): a store
+    only copies the buffers once it appends to a buffer which has already
+    grown past its own clauses through another copy.
+
+    Unlike the set of frozensets used by CNF by default, duplicate clauses
+    are not removed.
+    """
+
+    def __init__(self):
+        self._lits = array('i')
+        self._offsets = array('q', [0])
+        self._num_clauses = 0
+
+
+    def __len__(self):
+        return self._num_clauses
+
+
+    def __iter__(self):
+        """
+        Iterates over the clauses as tuples of literals.
+        """
+        lits = self._lits
+        offsets = self._offsets
+        for i in range(self._num_clauses):
+            yield tuple(lits[offsets[i]:offsets[i + 1]])
+
+
+    def __str__(self):
+        return [list(clause) for clause in self].__str__()
+
+
+    def copy(self):
+        """
+        Returns a copy of self which shares the buffers with self until
+        either of them is modified.
+        """
+        store = ClauseStore()
+        store._lits = self._lits
+        store._offsets = self._offsets
+        store._num_clauses = self._num_clauses
+        return store
+
+
+    def _detach(self):
+        """
+        Copies the buffers if another store has already appended to them.
+        """
+        num_lits = self._offsets[self._num_clauses]
+        if len(self._offsets) != self._num_clauses + 1 or \
+           len(self._lits) != num_lits:
+            self._lits = self._lits[:num_lits]
+            self._offsets = self._offsets[:self._num_clauses + 1]
+
+
+    def add(self, clause):
+        """
+        Appends the given clause (an iterable of literals).
+        """
+        self._detach()
+        self._lits.extend(clause)
+        self._offsets.append(len(self._lits))
+        self._num_clauses += 1
+
+
+    def extend(self, clauses):
+        """
+        Appends all given clauses.
+        """
+        self._detach()
+        lits = self._lits
+        offsets = self._offsets
+        for clause in clauses:
+            lits.extend(clause)
+            offsets.append(len(lits))
+        self._num_clauses = len(offsets) - 1
+
+
+    def views(self):
+        """
+        Iterates over the clauses as memoryviews into the literal buffer,
+        which can be handed to a solver without copying any literals. No
+        clauses can be added to the store while a view is alive.
+        """
+        offsets = self._offsets
+        with memoryview(self._lits) as lits:
+            for i in range(self._num_clauses):
+                yield lits[offsets[i]:offsets[i + 1]]
 
 
 class CNF:
@@ -24,12 +119,18 @@ class CNF:
 
     Variables are assumed to be numbered consecutively starting from 1, i.e. if
     num_vars = 5, then the variables are [1, 2, 3, 4, 5].
+
+    By default the clauses are kept in a set of frozensets. With
+    `compact=True` they are kept in a ClauseStore instead, which uses much
+    less memory on large formulas and makes copies cheap.
     """
 
-    def __init__(self):
+    def __init__(self, compact=False):
         self.num_vars = 0
-        self.clauses = set()
+        self.compact = compact
+        self.clauses = ClauseStore() if compact else set()
         self.var_names = {} # map: var_number -> var_name
+        self.blocked = [] # variables blocked by block_positive_only()
 
 
     def __str__(self):
@@ -43,10 +144,11 @@ class CNF:
         """
         Return a copy of self.
         """
-        f = CNF()
+        f = CNF(compact=self.compact)
         f.num_vars = self.num_vars
         f.clauses = self.clauses.copy()
         f.var_names = self.var_names.copy()
+        f.blocked = list(self.blocked)
         return f
 
 
@@ -105,6 +207,16 @@ class CNF:
             self.num_vars += 1
 
 
+    def _add_new_vars(self, literals):
+        """
+        Calls add_var() for the variables in `literals` which are not yet
+        part of the formula (in increasing order).
+        """
+        new_vars = {abs(lit) for lit in literals if abs(lit) > self.num_vars}
+        for var in sorted(new_vars):
+            self.add_var(var)
+
+
     def add_clause(self, clause):
         """
         Adds the given clause to the formula.
@@ -112,11 +224,39 @@ class CNF:
         Args:
             clause: The clause to be added as an iterable of literals.
         """
-        variables = [abs(lit) for lit in clause]
-        variables.sort()
-        for var in variables:
-            self.add_var(var)
-        self.clauses.add(frozenset(clause))
+        self._add_new_vars(clause)
+        if self.compact:
+            self.clauses.add(clause)
+        else:
+            self.clauses.add(frozenset(clause))
+
+
+    def add_clauses(self, clauses):
+        """
+        Adds all of the given clauses to the formula at once. The variables
+        which are new to the formula must be consecutive over all `clauses`
+        together (rather than per clause, as with add_clause()).
+
+        Args:
+            clauses: An iterable of clauses, each an iterable of literals.
+        """
+        clauses = list(clauses)
+        self._add_new_vars(lit for clause in clauses for lit in clause)
+        if self.compact:
+            self.clauses.extend(clauses)
+        else:
+            self.clauses.update(frozenset(clause) for clause in clauses)
+
+
+    def solver_clauses(self):
+        """
+        Iterates over the clauses in a form which can be passed directly to a
+        pysat solver. For compact formulas these are views into the literal
+        buffer, so no clause is copied.
+        """
+        if self.compact:
+            return self.clauses.views()
+        return (list(clause) for clause in self.clauses)
 
 
     def add_tseitin_and(self, a, b, c=-1):
@@ -151,21 +291,103 @@ class CNF:
         return c
 
 
-    def add_tseitin_not(self, a, b=-1):
+    def add_tseitin_not(self, a, b=-1, polarity=0):
         """
         Adds clauses such that b <==> ~a. If the variable `b` is not given,
-        creates a new variable.
+        creates a new variable. With polarity=1 (-1) only b ==> ~a (~a ==> b)
+        is added.
 
         Returns:
             The variable `c`.
         """
         if b == -1:
             b = self.get_new_var()
-        self.add_clause([a, b])
-        self.add_clause([-a, -b])
+        if polarity <= 0:
+            self.add_clause([a, b])
+        if polarity >= 0:
+            self.add_clause([-a, -b])
         return b
 
 
+    def add_totalizer(self, inputs, ubound, polarity=0):
+        """
+        Adds a totalizer (unary counter) over the given inputs, with outputs
+        o_1, ..., o_u (u = min(len(inputs), ubound)) such that o_j <==> "at
+        least j inputs are True". With polarity=1 only o_j ==> "at least j"
+        is added, with polarity=-1 only "at least j" ==> o_j. The encoding
+        needs O(len(inputs) * ubound) clauses.
+
+        Returns:
+            The output variables [o_1, ..., o_u] as a list.
+        """
+        if len(inputs) == 1:
+            return [inputs[0]]
+
+        left = self.add_totalizer(inputs[:len(inputs)//2], ubound, polarity)
+        right = self.add_totalizer(inputs[len(inputs)//2:], ubound, polarity)
+        outputs = [self.get_new_var() for _ in range(min(len(inputs), ubound))]
+
+        # left[i-1] (right[j-1]) means at least i (j) inputs on the left (right)
+        for i in range(len(left) + 1):
+            for j in range(len(right) + 1):
+                # (at least i on the left) ^ (at least j on the right)
+                #   ==> at least i+j
+                if polarity <= 0 and 1 <= i + j <= len(outputs):
+                    clause = [outputs[i + j - 1]]
+                    if i > 0:
+                        clause.append(-left[i - 1])
+                    if j > 0:
+                        clause.append(-right[j - 1])
+                    self.add_clause(clause)
+                # (at most i on the left) ^ (at most j on the right)
+                #   ==> at most i+j
+                if polarity >= 0 and i + j < len(outputs):
+                    clause = [-outputs[i + j]]
+                    if i < len(left):
+                        clause.append(left[i])
+                    if j < len(right):
+                        clause.append(right[j])
+                    self.add_clause(clause)
+
+        return outputs
+
+
+    def add_tseitin_atleast(self, inputs, k, output=-1, polarity=0):
+        """
+        Adds clauses such that ATLEAST_k(inputs) <==> output, i.e. output is
+        True iff at least `k` of the inputs are True (a k-out-of-n voting
+        gate). This uses a totalizer (see add_totalizer()) instead of an OR of
+        ANDs over all combinations of k inputs. If the variable `output` is not
+        given, creates a new variable. With polarity=1 (-1) only the direction
+        output ==> ATLEAST_k(inputs) (ATLEAST_k(inputs) ==> output) is added.
+
+        Returns:
+            The variable `output`.
+        """
+        if k <= 0 or k > len(inputs):
+            # constant gate
+            if output == -1:
+                output = self.get_new_var()
+            if k <= 0 and polarity <= 0:
+                self.add_clause([output])
+            if k > len(inputs) and polarity >= 0:
+                self.add_clause([-output])
+            return output
+        if k == 1:
+            return self.add_nary_or(inputs, output, polarity)
+        if k == len(inputs):
+            return self.add_nary_and(inputs, output, polarity)
+
+        counter = self.add_totalizer(inputs, k, polarity)
+        if output == -1:
+            output = self.get_new_var()
+        if polarity >= 0:
+            self.add_clause([-output, counter[k - 1]])
+        if polarity <= 0:
+            self.add_clause([output, -counter[k - 1]])
+        return output
+
+
     def add_tseitin_multi_and(self, inputs, output=-1):
         """
         Adds clauses such that BIG_AND(inputs) <==> output. If the variable
@@ -218,14 +440,90 @@ class CNF:
             return self.add_tseitin_or(l_output, r_output, output)
 
 
-    def add_tseitin_multi(self, gate_type, inputs, output):
+    def add_nary_and(self, inputs, output=-1, polarity=0):
+        """
+        Adds clauses such that BIG_AND(inputs) <==> output, using a single
+        clause per input and one clause over all inputs (so without auxiliary
+        variables). If the variable `output` is not given, creates a new
+        variable.
+
+        With polarity=1 only output ==> BIG_AND(inputs) is added, and with
+        polarity=-1 only BIG_AND(inputs) ==> output (Plaisted-Greenbaum).
+        This is enough when `output` only occurs with that polarity.
+
+        Returns:
+            The variable `output`.
+        """
+        if output == -1:
+            output = self.get_new_var()
+        if polarity >= 0:
+            for a in inputs:
+                self.add_clause([-output, a])
+        if polarity <= 0:
+            self.add_clause([output] + [-a for a in inputs])
+        return output
+
+
+    def add_nary_or(self, inputs, output=-1, polarity=0):
+        """
+        Adds clauses such that BIG_OR(inputs) <==> output, using a single
+        clause per input and one clause over all inputs (so without auxiliary
+        variables). If the variable `output` is not given, creates a new
+        variable.
+
+        With polarity=1 only output ==> BIG_OR(inputs) is added, and with
+        polarity=-1 only BIG_OR(inputs) ==> output (Plaisted-Greenbaum).
+        This is enough when `output` only occurs with that polarity.
+
+        Returns:
+            The variable `output`.
+        """
+        if output == -1:
+            output = self.get_new_var()
+        if polarity >= 0:
+            self.add_clause([-output] + list(inputs))
+        if polarity <= 0:
+            for a in inputs:
+                self.add_clause([-a, output])
+        return output
+
+
+    def add_tseitin_multi(self, gate_type, inputs, output, polarity=None,
+                          k=None):
         """
         Adds clauses such that GATETYPE(inputs) <==> output. If the variable
-        `output` is not given, creates a new variable.
+        `output` is not given, creates a new variable. For gate type 'atleast'
+        `k` is the minimum number of inputs which need to be True, gate type
+        'not' takes a single input.
+
+        If `polarity` is given, the gate is encoded with n-ary clauses without
+        auxiliary variables, and only in the direction(s) needed for the
+        polarity in which `output` occurs: 1 (positive), -1 (negative) or 0
+        (both), see add_nary_and() and add_nary_or().
 
         Returns:
             The variable `output`.
         """
+        if gate_type == 'atleast':
+            return self.add_tseitin_atleast(inputs, k, output,
+                                            0 if polarity is None else polarity)
+        if gate_type == 'not':
+            if len(inputs) != 1:
+                raise ValueError("'not' gate expects exactly one input")
+            return self.add_tseitin_not(inputs[0], output,
+                                        0 if polarity is None else polarity)
+        if polarity is not None:
+            if gate_type == 'and':
+                return self.add_nary_and(inputs, output, polarity)
+            elif gate_type == 'or':
+                return self.add_nary_or(inputs, output, polarity)
+            else:
+                raise ValueError(f"Gate type '{gate_type}' currently not supported")
+        if len(inputs) == 1 and output != -1 and gate_type in ('and', 'or'):
+            # single input gate (e.g. a transfer gate): output <==> input
+            self.add_clause([-inputs[0], output])
+            self.add_clause([inputs[0], -output])
+            return output
         if gate_type == 'and':
             return self.add_tseitin_multi_and(inputs, output)
         elif gate_type == 'or':
@@ -243,8 +541,7 @@ class CNF:
         if variables is None:
             variables = self.get_vars()
         card = CardEnc.atmost(variables, bound=at_most, top_id=self.num_vars)
-        for clause in card.clauses:
-            self.add_clause(clause)
+        self.add_clauses(card.clauses)
 
 
     def assignment_to_set(self, assignment):
@@ -311,6 +608,7 @@ class CNF:
         """
 
         # Every clause must contain at least one literal in the assignment
+        assignment = set(assignment)
         for clause in self.clauses:
             sat = False
             for lit in clause:
@@ -322,6 +620,33 @@ class CNF:
         return True
 
 
+    def satisfying_mask(self, max_vars=grover.MAX_MASK_VARS):
+        """
+        Evaluates the formula for all 2^n assignments at once (for the
+        NumpyBackend of Grover search).
+
+        Args:
+            max_vars: (Optional) The largest number of variables n for which
+              the 2^n assignments are evaluated.
+
+        Returns:
+            Boolean array of shape (2^n,), whose entry i is True iff the
+            assignment in which variable v is True iff bit v - 1 of i is 1
+            satisfies the formula.
+        """
+        grover.check_mask_size(self.num_vars, max_vars)
+        indices = np.arange(2**self.num_vars, dtype=np.int64)
+        values = [None] + [(indices >> (var - 1)) & 1 == 1
+                           for var in self.get_vars()]
+        mask = np.ones(indices.size, dtype=bool)
+        for clause in self.solver_clauses():
+            sat = np.zeros(indices.size, dtype=bool)
+            for lit in clause:
+                sat |= values[lit] if lit > 0 else ~values[-lit]
+            mask &= sat
+        return mask
+
+
     def block(self, a):
         """
         Block the given (partial) assignment.
@@ -347,21 +672,39 @@ class CNF:
                 block.append(-lit)
         if len(block) > 0:
             self.add_clause(block)
+            self.blocked.append(tuple(-lit for lit in block))
 
 
-    def solve(self, method='classical', minimize_vars=None, verbose=True):
+    def solve(self, method='classical', minimize_vars=None, verbose=True, *,
+              budget=None, backend=None, batch_size=4, reuse_ancillas=True):
         """
         Gets 1 satisfying assignments if it exists.
 
         Args:
             method: a string in ['grover', 'classical', 'min-sat']
+            budget: (Optional) A solver_session.Budget which limits this call.
+              The 'grover' method only checks whether the budget has already
+              run out.
+            verbose: (Optional) If True, the 'grover' method prints the
+              statistics of its circuits.
+            backend: (Optional) The backend of the 'grover' method, e.g. a
+              grover.NumpyBackend. By default a grover.MyQLMBackend.
+            batch_size, reuse_ancillas: (Optional) The clause batching of the
+              oracle of the 'grover' method, see grover_circuits().
+
+        Returns:
+            A tuple (sat, model), with sat None if the budget ran out.
         """
+        if budget is not None and budget.expired():
+            return None, None
         if method == 'grover':
-            return self._solve_grover_myqlm()
+            return self._solve_grover(backend, verbose, {
+                'batch_size': batch_size, 'reuse_ancillas': reuse_ancillas})
         elif method == 'classical':
-            return self._solve_glucose_3()
+            return self._solve_glucose_3(budget=budget)
         elif method == 'min-sat':
-            return self._solve_min_sat(minimize_vars=minimize_vars)
+            return self._solve_min_sat(minimize_vars=minimize_vars,
+                                       budget=budget)
         else:
             raise ValueError(f"Unknown method '{method}'")
 
@@ -384,7 +727,7 @@ class CNF:
         return weighted
 
 
-    def _solve_max_sat(self, weight_map):
+    def _solve_max_sat(self, weight_map, budget=None):
         """
         Gets 1 satisfying assignment if it exists, maximizing the sum of weights
         of variables set to true.
@@ -394,9 +737,12 @@ class CNF:
 
         Args:
             weight_map: dictionary from (a subset of) variables to weights.
+            budget: (Optional) A solver_session.Budget which limits this call.
         """
         wcnf = self._to_weighted_formula(weight_map)
         rc2 = RC2(wcnf)
+        if budget is not None:
+            return budget.compute(rc2)
         model = rc2.compute()
         if model is not None:
             return True, model
@@ -404,7 +750,7 @@ class CNF:
             return False, model
 
 
-    def _solve_min_sat(self, minimize_vars=None):
+    def _solve_min_sat(self, minimize_vars=None, budget=None):
         """
         Gets 1 satisfying assignment if it exists, which minimizes the number of
         variables in `minimize_vars` set to True. If `minimize_vars` is not
@@ -412,6 +758,7 @@ class CNF:
 
         Args:
             minimize_vars: an iterable of variables (ints).
+            budget: (Optional) A solver_session.Budget which limits this call.
         """
 
         # NOTE: Because RC2 seems to have issues with negative weights, instead
@@ -425,20 +772,24 @@ class CNF:
         weight_map = {}
         for var in minimize_vars:
             weight_map[-var] = 1
-        return self._solve_max_sat(weight_map=weight_map)
+        return self._solve_max_sat(weight_map=weight_map, budget=budget)
 
 
-    def _solve_glucose_3(self):
+    def _solve_glucose_3(self, budget=None):
         """
         Gets 1 satisfying asignment if it exists, using a classical SAT solver.
+
+        Args:
+            budget: (Optional) A solver_session.Budget which limits this call.
         """
 
         # create initial formula
-        g = Glucose3()
-        for clause in self.clauses:
-            g.add_clause(list(clause))
+        g = Glucose3(bootstrap_with=self.solver_clauses())
 
-        sat = g.solve()
+        if budget is None:
+            sat = g.solve()
+        else:
+            sat = budget.solve(g)
         model = g.get_model()
         return sat, model
 
@@ -449,9 +800,7 @@ class CNF:
         """
 
         # create initial formula
-        g = Glucose3()
-        for clause in self.clauses:
-            g.add_clause(list(clause))
+        g = Glucose3(bootstrap_with=self.solver_clauses())
 
         count = 0
         for _ in g.enum_models():
@@ -459,100 +808,38 @@ class CNF:
         return count
 
 
-    def _solve_grover_myqlm(self, shots=100):
+    def grover_circuits(self, batch_size=4, reuse_ancillas=True):
         """
-        Gets 1 satisfying assignment if it exists, using a Grover implementation
-        with MyQLM as backend.
-        """
-
-        # 1. Define oracle and diffusion operator
-        n = self.num_vars
-        diffop = myqlm.diffusion(n)
-        oracle = myqlm.oracle_from_cnf(n, self.clauses)
-
-        # 2. Search over number of iterations
-        # (see https://arxiv.org/abs/quant-ph/9605034)
-        m = 1
-        _lambda = 1.2
-        while m <= math.sqrt(2**n):
-            r = random.randint(1, round(m))
-
-            # 3. Define Grover
-            grover = Program()
-            qubits = grover.qalloc(n)
-
-            # 3a. Apply H to non-ancilla qubits
-            for wire in qubits:
-                H(wire)
-
-            # 3b. Repeat oracle + diffusion operator r times
-            for _ in range(r):
-                oracle(qubits)
-                diffop(qubits)
-
-            # 4. Create and run job
-            circuit = grover.to_circ()
-            job = circuit.to_job(nbshots=shots)
-            result = get_default_qpu().submit(job)
-
-            # get the top-1 most frequent result
-            var_order = myqlm.grover_var_map(4)
-            assignments = self._process_grover_result('myqlm', result, var_order, 1)
+        Returns the (cached) myqlm_functions.GroverCircuits of this formula.
+        The clauses added by block_positive_only() are added to the oracle of
+        the other clauses as separate terms, see
+        myqlm_functions.IncrementalOracle.
 
-            if len(assignments) == 0:
-                m *= _lambda
-                continue
-            else:
-                return True, assignments[0]
-
-        return False, None
-
-
-    def _process_grover_result(self, backend, result, var_order, n):
-        """
-        Helper to get relevant information from the measurement results.
-        """
-
-        # parse results depending on backend
-        if backend == 'myqlm':
-            m = {}
-            for sample in result:
-                m[sample.state.bitstring] = sample.probability
-        else:
-            raise ValueError(f"Unknown backend '{backend}'")
-
-        # sort measurements by frequency
-        sorted_m = sorted(m.items(), key=lambda x: x[1], reverse=True)
-
-        # enumerate sorted measurements
-        res = []
-        done = False
-        found = 0
-        while (not done and found < n):
-            # format assignment from bitstring to lits (e.g. 110 -> [1,2,-3])
-            measurement, _ = sorted_m[found]
-            # reverse for qiskit result
-            #measurement = measurement[::-1] # reverse so that q0 is index 0
-
-            # NOTE: the qubit numbers from PhaseOracle(expression) correspond
-            # to the order in which the variables apprear in `expression`.
-            # Because of this, we keep track of the `var_order` in which the
-            # variables apprear in `expression` and need to do a bit of juggling
-            # while translating the measurement outcome to the assignment
-            assignment = []
-            for var in range(1, self.num_vars + 1):
-                bit = measurement[var_order[var]]
-                if bit == '0':
-                    assignment.append(-var)
-                else:
-                    assignment.append(var)
-
-            # check if assignment is actually satisfying
-            sat = self.is_satisfying(assignment)
-            if sat:
-                found += 1
-                res.append(assignment)
-            else:
-                done = True
-
-        return res
+        Args:
+            batch_size: (Optional) The number of clause ancillas ANDed by one
+              gate, None for a single AND of all clauses (see
+              myqlm_functions.oracle_from_clauses()).
+            reuse_ancillas: (Optional) Whether every batch of clauses reuses
+              the same ancillas.
+        """
+        blocking = {frozenset(-var for var in block) for block in self.blocked}
+        base = [clause for clause in map(frozenset, self.solver_clauses())
+                if clause not in blocking]
+        oracle = myqlm.get_incremental_oracle(
+            self.num_vars, (frozenset(base), batch_size, reuse_ancillas),
+            lambda: myqlm.cnf_routine(self.num_vars, base, batch_size,
+                                      reuse_ancillas))
+        return oracle.circuits(self.blocked)
+
+
+    def _solve_grover(self, backend=None, verbose=False, oracle_options=None,
+                      shots=100):
+        """
+        Gets 1 satisfying assignment if it exists, using Grover search on the
+        given backend (see grover.grover_search()).
+        """
+        assignment = grover.grover_search(self, backend, shots, oracle_options,
+                                          verbose)
+        if assignment is None:
+            return False, None
+        return True, assignment
@@ -0,0 +1,185 @@
+"""
+Direct evaluation of the structure function of a fault tree, without a CNF
+formula or a solver. The fault tree is compiled once into a list of gate
+operations in topological order, which are then applied to many scenarios
+(assignments to the basic events) at a time: every node holds one bit per
+scenario, packed into bytes, so each gate operation is a vectorised bitwise
+operation over all scenarios.
+"""
+import numpy as np
+
+from ft_2_quantum_sat.preprocessing import gates_bottom_up
+
+
+class Evaluator:
+    """
+    Compiled structure function of a fault tree. Scenarios are given as
+    boolean arrays of shape (E, S), with a row for every basic event in
+    `events` and a column per scenario.
+    """
+
+    def __init__(self, ft, top_event=None):
+        """
+        Args:
+            ft: The FaultTree.
+            top_event: (Optional) Evaluate this node instead of the top event.
+        """
+        top = top_event if top_event is not None else ft.top_event
+        top = ft.aliases.get(top, top)
+        self.top_event = top
+        self.constant = ft.constants.get(top)
+        cone = {top} if self.constant is not None else ft.cone_of_influence(top)
+
+        self.events = sorted(n for n in cone if ft.node_types[n] == 'input')
+        self.slots = {event: i for i, event in enumerate(self.events)}
+        self.house_events = {} # slot -> value
+        self.program = [] # (slot, gate type, input slots, k)
+        if self.constant is not None:
+            return
+
+        for node in gates_bottom_up(ft, cone):
+            node_type = ft.node_types[node]
+            slot = len(self.slots)
+            self.slots[node] = slot
+            if node_type == 'house':
+                self.house_events[slot] = ft.house_events[node]
+            else:
+                inputs = [self.slots[i] for i in ft.get_gate_inputs(node)]
+                self.program.append((slot, node_type, inputs,
+                                     ft.thresholds.get(node)))
+
+
+    def evaluate_packed(self, packed, all_nodes=False):
+        """
+        Evaluates packed scenarios: bit j of byte w of row i is the value of
+        event i in scenario 8*w + j.
+
+        Args:
+            packed: uint8 array of shape (E, W).
+            all_nodes: (Optional) If True, returns the values of all nodes.
+
+        Returns:
+            The packed values of the top event, shape (W,), or of all nodes,
+            shape (number of nodes, W), with rows as in `slots`.
+        """
+        num_words = packed.shape[1]
+        if self.constant is not None:
+            return np.full(num_words, 255 if self.constant else 0, np.uint8)
+
+        values = np.empty((len(self.slots), num_words), dtype=np.uint8)
+        values[:len(self.events)] = packed
+        for slot, value in self.house_events.items():
+            values[slot] = 255 if value else 0
+        for slot, gate_type, inputs, k in self.program:
+            if gate_type == 'and':
+                values[slot] = np.bitwise_and.reduce(values[inputs], axis=0)
+            elif gate_type == 'or':
+                values[slot] = np.bitwise_or.reduce(values[inputs], axis=0)
+            elif gate_type == 'not':
+                values[slot] = np.invert(values[inputs[0]])
+            elif gate_type == 'atleast':
+                values[slot] = _atleast(values[inputs], k)
+            else:
+                raise ValueError(f"Gate type '{gate_type}' not supported")
+
+        if all_nodes:
+            return values
+        return values[self.slots[self.top_event]]
+
+
+    def evaluate(self, scenarios, all_nodes=False):
+        """
+        Evaluates the top event (or all nodes) for every scenario.
+
+        Args:
+            scenarios: Boolean array of shape (E, S).
+            all_nodes: (Optional) If True, returns a dictionary from node name
+              to its values instead.
+
+        Returns:
+            Boolean array of shape (S,), or a dictionary of such arrays.
+        """
+        scenarios = np.asarray(scenarios, dtype=bool)
+        num_scenarios = scenarios.shape[1]
+        packed = np.packbits(scenarios, axis=1, bitorder='little')
+        values = self.evaluate_packed(packed, all_nodes)
+        values = np.unpackbits(values, axis=-1, count=num_scenarios,
+                               bitorder='little').astype(bool)
+        if all_nodes:
+            return {node: values[slot] for node, slot in self.slots.items()}
+        return values
+
+
+    def monte_carlo(self, num_samples, probs, batch_size=2**16, seed=None):
+        """
+        Estimates the top event probability by sampling the basic events
+        independently with the given probabilities.
+
+        Args:
+            num_samples: The number of scenarios to sample.
+            probs: Dictionary from event name to probability, e.g.
+              FaultTree.probs.
+            batch_size: (Optional) The number of scenarios evaluated at once.
+            seed: (Optional) Seed for the random number generator.
+
+        Returns:
+            A tuple (estimate, standard error).
+        """
+        missing = [e for e in self.events if probs.get(e) is None]
+        if len(missing) > 0:
+            raise ValueError(f"Events {missing} have no probability")
+        event_probs = np.array([probs[e] for e in self.events])[:, None]
+        rng = np.random.default_rng(seed)
+
+        hits = 0
+        done = 0
+        while done < num_samples:
+            size = min(batch_size, num_samples - done)
+            scenarios = rng.random((len(self.events), size)) < event_probs
+            hits += np.count_nonzero(self.evaluate(scenarios))
+            done += size
+
+        estimate = hits / num_samples
+        return estimate, np.sqrt(estimate * (1 - estimate) / num_samples)
+
+
+    def check_cutsets(self, cutsets):
+        """
+        Checks independently of any solver whether the given cut sets (e.g.
+        from FaultTree.compute_min_cutsets()) are cut sets, and whether they
+        are minimal, i.e. no longer cut sets when any single event is removed
+        (which is enough for fault trees without 'not' gates).
+
+        Returns:
+            A tuple (is_cutset, is_minimal) of boolean arrays with a value per
+            cut set.
+        """
+        sizes = np.array([len(c) for c in cutsets], dtype=np.int64)
+        rows = [self.slots[e] for c in cutsets for e in c]
+        cols = np.repeat(np.arange(len(cutsets)), sizes)
+        scenarios = np.zeros((len(self.events), len(cutsets)), dtype=bool)
+        scenarios[rows, cols] = True
+        is_cutset = self.evaluate(scenarios)
+
+        # one scenario per (cut set, removed event)
+        reduced = scenarios[:, cols]
+        reduced[rows, np.arange(len(rows))] = False
+        still_cut = self.evaluate(reduced)
+        is_minimal = is_cutset.copy()
+        np.logical_and.at(is_minimal, cols, ~still_cut)
+        return is_cutset, is_minimal
+
+
+def _atleast(inputs, k):
+    """
+    Bit-parallel 'at least k of the rows of `inputs`': counts[j] holds the
+    scenarios in which at least j+1 of the inputs seen so far are True.
+    """
+    if k <= 0:
+        return np.full(inputs.shape[1], 255, dtype=np.uint8)
+    counts = [np.zeros(inputs.shape[1], dtype=np.uint8) for _ in range(k)]
+    for row in inputs:
+        for j in range(k - 1, 0, -1):
+            counts[j] |= counts[j - 1] & row
+        counts[0] |= row
+    return counts[k - 1]
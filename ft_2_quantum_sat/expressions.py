@@ -0,0 +1,171 @@
+"""
+Expressions of the Open-PSA Model Exchange Format, which give the
+probabilities of basic events in terms of parameters (<define-parameter>),
+the mission time, and probability distributions. Expressions are parsed into
+nested tuples (tag, value, arguments), and are evaluated either to a single
+point estimate or, vectorised, to N samples at once for uncertainty analysis.
+"""
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+
+DEFAULT_MISSION_TIME = 8760.0 # hours, one year
+
+# n-ary arithmetic operations
+_OPERATIONS = {
+    'add': lambda args: sum(args[1:], args[0]),
+    'sub': lambda args: args[0] - sum(args[1:]),
+    'mul': lambda args: math.prod(args[1:], start=args[0]),
+    'div': lambda args: args[0] / math.prod(args[1:]),
+    'neg': lambda args: -args[0],
+}
+
+# distributions, evaluated to their mean or sampled
+_DEVIATES = {'uniform-deviate', 'normal-deviate', 'lognormal-deviate'}
+
+
+def parse(xml_element):
+    """
+    Parses an expression from an XML element, e.g. the <exponential> element
+    of a <define-basic-event>.
+
+    Returns:
+        The expression as a tuple (tag, value, arguments), where the value is
+        the number of a constant, the name of a parameter, and None otherwise.
+    """
+    tag = xml_element.tag
+    if tag in ('float', 'int'):
+        return (tag, float(xml_element.attrib['value']), ())
+    if tag == 'bool':
+        return (tag, float(xml_element.attrib['value'] == 'true'), ())
+    if tag == 'parameter':
+        return (tag, xml_element.attrib['name'], ())
+    if tag == 'system-mission-time':
+        return (tag, None, ())
+    if tag in _OPERATIONS or tag in _DEVIATES or \
+            tag in ('exponential', 'GLM', 'periodic-test'):
+        return (tag, None, tuple(parse(child) for child in xml_element))
+    raise ValueError(f"Expression '{tag}' currently not supported")
+
+
+def evaluate(expression, parameters, mission_time=DEFAULT_MISSION_TIME,
+             num_samples=None, rng=None, cache=None):
+    """
+    Evaluates an expression.
+
+    Args:
+        expression: The expression, see parse().
+        parameters: Dictionary from parameter name to expression.
+        mission_time: (Optional) The value of <system-mission-time>.
+        num_samples: (Optional) If given, every distribution is sampled
+          `num_samples` times and the result is an array of that length.
+          Otherwise distributions are replaced by their mean and the result is
+          a single float.
+        rng: (Optional) NumPy random Generator used for sampling.
+        cache: (Optional) Dictionary from parameter name to its value. Pass
+          the same dictionary for all expressions of a model, so every
+          parameter is evaluated (and sampled) once and its samples are shared
+          by all expressions using it.
+
+    Returns:
+        A float, or an array of shape (num_samples,).
+    """
+    if cache is None:
+        cache = {}
+    if num_samples is not None and rng is None:
+        rng = np.random.default_rng()
+
+    def value_of(expr):
+        tag, value, args = expr
+        if tag in ('float', 'int', 'bool'):
+            return value
+        if tag == 'system-mission-time':
+            return mission_time
+        if tag == 'parameter':
+            if value not in cache:
+                if value not in parameters:
+                    raise ValueError(f"Parameter '{value}' is not defined")
+                cache[value] = value_of(parameters[value])
+            return cache[value]
+
+        values = [value_of(arg) for arg in args]
+        if tag in _OPERATIONS:
+            return _OPERATIONS[tag](values)
+        if tag == 'exponential':
+            return _exponential(*values)
+        if tag == 'GLM':
+            return _glm(*values)
+        if tag == 'periodic-test':
+            if len(values) != 4:
+                raise ValueError(f"periodic-test with {len(values)} arguments "
+                                 "not supported")
+            return _periodic_test(*values)
+        return _deviate(tag, values, num_samples, rng)
+
+    result = value_of(expression)
+    if num_samples is not None:
+        return np.broadcast_to(np.asarray(result, dtype=np.float64),
+                               (num_samples,))
+    return float(result)
+
+
+def _exponential(rate, time):
+    """
+    Probability of failure before `time` with a constant failure rate.
+    """
+    return -np.expm1(-np.multiply(rate, time))
+
+
+def _glm(gamma, rate, repair_rate, time):
+    """
+    Unavailability at `time` of a repairable component with failure rate
+    `rate`, repair rate `repair_rate`, and probability `gamma` of failing on
+    demand.
+    """
+    total = np.add(rate, repair_rate)
+    return (rate - (rate - np.multiply(gamma, total))
+            * np.exp(-np.multiply(total, time))) / total
+
+
+def _periodic_test(rate, interval, first_test, time):
+    """
+    Unavailability at `time` of a component which fails with a constant rate
+    and is tested (and, if failed, instantly repaired) every `interval` hours
+    from `first_test` on (the 4 argument form of <periodic-test>).
+    """
+    rate, interval, first_test, time = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64)
+          for v in (rate, interval, first_test, time)))
+    since_test = np.where(time <= first_test, time,
+                          np.mod(time - first_test, interval))
+    return -np.expm1(-rate * since_test)
+
+
+def _deviate(tag, values, num_samples, rng):
+    """
+    The mean of a distribution, or `num_samples` samples of it.
+    """
+    if tag == 'uniform-deviate':
+        low, high = values
+        if num_samples is None:
+            return (low + high) / 2
+        return rng.uniform(low, high, num_samples)
+    if tag == 'normal-deviate':
+        mean, sigma = values
+        if num_samples is None:
+            return mean
+        return rng.normal(mean, sigma, num_samples)
+
+    # lognormal-deviate with a mean, error factor and (optional) level
+    if len(values) not in (2, 3):
+        raise ValueError("lognormal-deviate needs a mean, an error factor and "
+                         "a level")
+    mean, error_factor = values[0], values[1]
+    if num_samples is None:
+        return mean
+    level = values[2] if len(values) == 3 else 0.95
+    sigma = np.log(error_factor) / NormalDist().inv_cdf((1 + level) / 2)
+    mu = np.log(mean) - sigma**2 / 2
+    return rng.lognormal(mu, sigma, num_samples)
@@ -2,12 +2,29 @@
 Definition of FaultTree class to hold all fault tree functionality.
 """
 
+import itertools
+import math
+import time
 import xml.etree.ElementTree as ElementTree
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
 from networkx.drawing.nx_pydot import graphviz_layout
 
+from ft_2_quantum_sat.circuit import CircuitFormula
 from ft_2_quantum_sat.cnf import CNF
+from ft_2_quantum_sat.evaluation import Evaluator
+from ft_2_quantum_sat.model_cache import ModelCache, model_files
+from ft_2_quantum_sat.solver_session import MaxSATSession, SATSession
+from ft_2_quantum_sat import expressions
+from ft_2_quantum_sat import modules
+from ft_2_quantum_sat import parallel
+from ft_2_quantum_sat import preprocessing
+from ft_2_quantum_sat import quantification
+
+# child elements of definitions which are not (part of) an expression
+_NON_EXPRESSIONS = ('label', 'attributes')
+
 
 class FaultTree:
     """
@@ -21,8 +38,16 @@ class FaultTree:
         self.top_event = None # should be one of the gate names
         self.basic_events = set()
         self.probs = {} # event name -> prob
+        self.expressions = {} # event name -> expression of its probability
+        self.parameters = {} # parameter name -> expression
+        self.mission_time = expressions.DEFAULT_MISSION_TIME
         self.node_types = {} # gate name -> {input, and, or, ...}
-        self._suported_gates = {'and', 'or'}
+        self.thresholds = {} # 'atleast' gate name -> min number of inputs
+        self.house_events = {} # house event name -> True/False
+        self.aliases = {} # removed gate name -> equivalent node name
+        self.constants = {} # removed gate name -> constant value
+        self.parse_stats = {} # filled in when loaded from XML
+        self._suported_gates = {'and', 'or', 'atleast', 'not'}
 
 
     def set_top_event(self, name):
@@ -42,11 +67,25 @@ class FaultTree:
         self.probs[name] = prob
 
 
-    def add_gate(self, name, gate_type, inputs):
+    def add_house_event(self, name, value):
+        """
+        Adds a house event, i.e. an event with a constant value (True/False).
+        """
+        self.graph.add_node(name)
+        self.node_types[name] = 'house'
+        self.house_events[name] = value
+
+
+    def add_gate(self, name, gate_type, inputs, k=None):
         """
-        Adds a gate node to the fault tree, with type in {'and', 'or', ...},
-        and given inputs
+        Adds a gate node to the fault tree, with type in {'and', 'or',
+        'atleast', 'not'}, and given inputs. For 'atleast' gates, `k` is the
+        number of inputs which need to fail for the gate to fail.
         """
+        if gate_type == 'atleast':
+            if k is None:
+                raise ValueError("'atleast' gate needs a value for k")
+            self.thresholds[name] = k
         self.graph.add_node(name)
         self.node_types[name] = gate_type
         for _input in inputs:
@@ -67,122 +106,818 @@ class FaultTree:
         return self.graph.number_of_nodes()
 
 
-    def to_cnf(self):
+    def cone_of_influence(self, node=None):
+        """
+        Returns the set of nodes which the given node (by default the top
+        event) depends on, including the node itself.
+        """
+        if node is None:
+            node = self.top_event
+        cone = nx.descendants(self.graph, node)
+        cone.add(node)
+        return cone
+
+
+    def polarities(self, node=None):
+        """
+        Returns a map from every node in the cone of influence of the given
+        node (by default the top event) to the polarity in which it occurs
+        when that node is asserted: 1 (only positive), -1 (only negative) or 0
+        (both). For fault trees with only AND/OR gates everything is positive.
+        """
+        if node is None:
+            node = self.top_event
+        seen = {node: {1}}
+        stack = [(node, 1)]
+        while len(stack) > 0:
+            name, pol = stack.pop()
+            if self.node_types[name] == 'not':
+                pol = -pol
+            for input_name in self.get_gate_inputs(name):
+                if pol not in seen.setdefault(input_name, set()):
+                    seen[input_name].add(pol)
+                    stack.append((input_name, pol))
+
+        res = {}
+        for name, pols in seen.items():
+            res[name] = pols.pop() if len(pols) == 1 else 0
+        return res
+
+
+    def simplify(self):
+        """
+        Returns a structurally simplified copy of this fault tree, with
+        constant house events propagated, single input gates removed, nested
+        gates of the same type merged, and dangling nodes dropped. The cut sets
+        of the simplified fault tree are the same as those of the original
+        (see preprocessing.simplify()).
+        """
+        return preprocessing.simplify(self)
+
+
+    def merge_identical_gates(self):
         """
-        Converts the FT to a CNF expression.
+        Returns a copy of this fault tree in which structurally identical gates
+        (same type and same inputs) are merged into one shared node, so that
+        duplicated logic is only encoded once (see
+        preprocessing.merge_identical_gates()).
         """
-        f = CNF()
+        return preprocessing.merge_identical_gates(self)
+
 
-        # 1. assign var numbers to all the events (and gates)
+    def find_modules(self, top_event=None):
+        """
+        Returns the gates which are modules of this fault tree, i.e. gates
+        whose sub-DAG shares no nodes with the rest of the fault tree (see
+        modules.find_modules()).
+        """
+        return modules.find_modules(self, top_event)
+
+
+    def evaluator(self, top_event=None):
+        """
+        Returns an Evaluator, which evaluates the structure function of this
+        fault tree directly for many scenarios at once (e.g. for Monte Carlo
+        estimation, or to check cut sets without a solver).
+        """
+        return Evaluator(self, top_event)
+
+
+    def to_cnf(self, compact=False, top_event=None, encoding='tseitin'):
+        """
+        Converts the FT to a CNF expression. Only the cone of influence of the
+        top event is encoded, nodes which the top event doesn't depend on get
+        no variables.
+
+        Args:
+            compact: (Optional) If True, the clauses of the CNF are kept in a
+              compact ClauseStore instead of a set (for large fault trees).
+            top_event: (Optional) Encode the FT with this node as top event
+              instead of `self.top_event` (e.g. to analyse a subsystem).
+            encoding: (Optional) With 'tseitin' every gate is encoded as an
+              equivalence, split into binary gates. With 'plaisted-greenbaum'
+              gates are encoded as n-ary clauses, and only in the direction
+              needed for the polarity of the gate (see polarities()), which
+              for monotone fault trees about halves the number of clauses.
+        """
+        if encoding not in ('tseitin', 'plaisted-greenbaum'):
+            raise ValueError(f"Unknown encoding '{encoding}'")
+        f = CNF(compact=compact)
+        if top_event is None:
+            top_event = self.top_event
+        top_event = self.aliases.get(top_event, top_event)
+        cone = self.cone_of_influence(top_event)
+        polarities = None
+        if encoding == 'plaisted-greenbaum':
+            polarities = self.polarities(top_event)
+        nodes = [node for node in self.graph.nodes if node in cone]
+
+        # 1. assign var numbers to all the events (and gates), inputs first
         input_vars = {}     # map : var_name -> var_number
         internal_vars = {}  # map : var_name -> var_number
-        for node in self.graph.nodes:
-            v = f.get_new_var(name=node)
+        for node in nodes:
             if self.node_types[node] == 'input':
-                input_vars[node] = v
-            else:
-                internal_vars[node] = v
+                input_vars[node] = f.get_new_var(name=node)
+        for node in nodes:
+            if self.node_types[node] != 'input':
+                internal_vars[node] = f.get_new_var(name=node)
         all_vars = input_vars.copy()
         all_vars.update(internal_vars)
 
         # 2. for every non-input node, add tseitin constraints to f
         for gate_name, output_var in internal_vars.items():
+            if self.node_types[gate_name] == 'house':
+                value = self.house_events[gate_name]
+                f.add_clause([output_var if value else -output_var])
+                continue
             input_names = self.get_gate_inputs(gate_name)
             gate_input_vars = []
             for input_name in input_names:
                 gate_input_vars.append(all_vars[input_name])
             gate_type = self.node_types[gate_name]
-            f.add_tseitin_multi(gate_type, gate_input_vars, output_var)
+            k = self.thresholds.get(gate_name)
+            if polarities is None:
+                f.add_tseitin_multi(gate_type, gate_input_vars, output_var, k=k)
+            else:
+                f.add_tseitin_multi(gate_type, gate_input_vars, output_var,
+                                    polarity=polarities[gate_name], k=k)
 
         # 3. add clause containing only the top event as (positive) literal
-        f.add_clause([all_vars[self.top_event]])
+        f.add_clause([all_vars[top_event]])
 
         return f, all_vars, input_vars.values()
 
 
-    def compute_min_cutsets(self, m, method, formula=None):
+    def compute_min_cutsets(self, m, method, formula=None, *,
+                            cardinality='totalizer', top_event=None,
+                            encoding='tseitin', modular=False,
+                            processes=None, budget=None, grover_options=None):
         """
-        Computes the `m` smallest cut sets of this fault tree.
+        Computes the `m` smallest cut sets of this fault tree. Only the basic
+        events in the cone of influence of the top event are considered.
 
         Args:
             m: The number of cutsets to compute.
             method: String in ['grover', 'classical', 'min-sat']
             formula: (Optional) If set, computes minimal cutsets for the given
               CNF formula, instead of for self (mostly for debugging purposes).
+            cardinality: (Optional) How the 'classical' method bounds the
+              cut set order. With 'totalizer' the counter is encoded once and
+              the bound is moved through solver assumptions, with 'selector'
+              a new encoding is added for every order.
+            top_event: (Optional) Compute the cut sets of this node instead of
+              `self.top_event` (e.g. to analyse a subsystem).
+            encoding: (Optional) The gate encoding used by to_cnf(), 'tseitin'
+              or 'plaisted-greenbaum'. With 'circuit' (only for the 'grover'
+              method) no CNF is built: Grover searches over the basic events
+              only, and the oracle computes the gates on ancillas (see
+              circuit.CircuitFormula).
+            modular: (Optional) If True, the fault tree is split into
+              independent modules whose cut sets are computed separately and
+              then combined (see modules.compute_min_cutsets_modular()). Only
+              for the 'classical' method on fault trees without 'not' gates.
+            processes: (Optional) If set, the 'classical' search is split into
+              disjoint sub-problems which are solved by this many worker
+              processes (see parallel.compute_min_cutsets_parallel()).
+            budget: (Optional) A solver_session.Budget with time, conflict
+              and/or propagation limits. When it runs out, the cut sets found
+              so far are returned, and `budget.complete` tells for every
+              order k whether all cut sets of order k were found.
+            grover_options: (Optional) A dict of keyword arguments which the
+              'grover' method passes to CNF.solve(): the `backend` (e.g. a
+              grover.NumpyBackend, by default MyQLM), the clause batching of
+              the oracle (`batch_size` and `reuse_ancillas`, see
+              CNF.grover_circuits()), and `verbose` to print the statistics
+              of the circuits.
 
         Returns:
             The cut set as a list of sets of basic event names.
         """
+        if (modular or processes is not None) and \
+                (method != 'classical' or formula is not None):
+            raise ValueError("Modular and parallel cut set computation are "
+                             "only supported for the 'classical' method")
+        if modular and processes is not None:
+            raise ValueError("Cannot combine `modular` and `processes`")
+        if (modular or processes is not None) and budget is not None:
+            raise ValueError("A budget is not supported for modular or "
+                             "parallel cut set computation")
+        if processes is not None:
+            return parallel.compute_min_cutsets_parallel(
+                self, m, processes=processes, top_event=top_event,
+                encoding=encoding)
+        if modular:
+            return modules.compute_min_cutsets_modular(
+                self, m, top_event=top_event, cardinality=cardinality,
+                encoding=encoding)
 
         if formula is None:
-            f, _, input_vars = self.to_cnf()
+            f, input_vars = self._cutset_formula(method, top_event, encoding)
+        elif encoding == 'circuit':
+            raise ValueError("The 'circuit' encoding cannot be used with a "
+                             "given formula")
         else:
             f = formula.copy()
             input_vars = formula.get_vars()
 
         cutsets = []
-        for k in range(1, len(input_vars) + 1):
-            f_k = f.copy()
+        if m > 0:
+            generator = self._iter_min_cutsets(
+                f, input_vars, method, cardinality, budget=budget,
+                grover_options=grover_options)
+            for cutset in generator:
+                cutsets.append(cutset)
+                if len(cutsets) == m:
+                    break
+            generator.close()
+        return f.assignments_to_sets(cutsets)
+
+
+    def iter_min_cutsets(self, method='classical', *, cardinality='totalizer',
+                         top_event=None, encoding='tseitin', budget=None,
+                         grover_options=None):
+        """
+        Generator version of compute_min_cutsets(), which yields every minimal
+        cut set as soon as it is found, in order of non-decreasing size. The
+        caller can stop at any point (e.g. with `break`), after which the
+        solver is freed, so there is no need to choose `m` up front.
+
+        Args:
+            method: (Optional) String in ['grover', 'classical', 'min-sat']
+            cardinality: (Optional) See compute_min_cutsets().
+            top_event: (Optional) See compute_min_cutsets().
+            encoding: (Optional) See compute_min_cutsets().
+            budget: (Optional) See compute_min_cutsets(), the generator stops
+              when the budget runs out.
+            grover_options: (Optional) See compute_min_cutsets().
+
+        Yields:
+            The cut sets as sets of basic event names.
+        """
+        f, input_vars = self._cutset_formula(method, top_event, encoding)
+        for cutset in self._iter_min_cutsets(f, input_vars, method,
+                                             cardinality, budget=budget,
+                                             grover_options=grover_options):
+            yield f.assignment_to_set(cutset)
+
+
+    def _cutset_formula(self, method, top_event, encoding):
+        """
+        Returns the formula (a CNF, or a CircuitFormula for the 'circuit'
+        encoding) whose solutions are the cut sets of the top event, and its
+        input variables.
+        """
+        if encoding != 'circuit':
+            f, _, input_vars = self.to_cnf(top_event=top_event,
+                                           encoding=encoding)
+            return f, input_vars
+        if method != 'grover':
+            raise ValueError("The 'circuit' encoding is only supported for "
+                             "the 'grover' method")
+        f, input_vars = CircuitFormula.from_fault_tree(self, top_event)
+        return f, input_vars.values()
+
+
+    def compute_most_probable_cutsets(self, m, top_event=None,
+                                      encoding='tseitin', budget=None):
+        """
+        Computes the `m` most probable minimal cut sets of this fault tree,
+        assuming independent basic events, so the probability of a cut set is
+        the product of the probabilities of its events.
+
+        Args:
+            m: The number of cutsets to compute.
+            top_event: (Optional) See compute_min_cutsets().
+            encoding: (Optional) See compute_min_cutsets().
+            budget: (Optional) See compute_min_cutsets().
+
+        Returns:
+            The cut sets as a list of sets of basic event names, most probable
+            first.
+        """
+        if m <= 0:
+            return []
+        generator = self.iter_most_probable_cutsets(
+            top_event=top_event, encoding=encoding, budget=budget)
+        cutsets = list(itertools.islice(generator, m))
+        generator.close()
+        return cutsets
+
+
+    def iter_most_probable_cutsets(self, top_event=None, encoding='tseitin',
+                                   budget=None, scale=10**6):
+        """
+        Yields the minimal cut sets of this fault tree in order of
+        non-increasing probability. Every cut set is found with one weighted
+        MaxSAT call (see MaxSATSession), where a basic event with probability
+        p costs -log(p) when it is True, so the cheapest cut set which isn't
+        blocked yet is the most probable one.
+
+        RC2 needs integer weights, so the costs are multiplied by `scale` and
+        rounded (with a minimum of 1, which also keeps every found cut set
+        minimal). Cut sets whose probabilities are very close may therefore
+        come out in a slightly different order.
+
+        Args:
+            top_event: (Optional) See compute_min_cutsets().
+            encoding: (Optional) See compute_min_cutsets().
+            budget: (Optional) See compute_min_cutsets().
+            scale: (Optional) The factor applied to the costs.
+
+        Yields:
+            The cut sets as sets of basic event names.
+        """
+        f, all_vars, input_vars = self.to_cnf(top_event=top_event,
+                                              encoding=encoding)
+        input_vars = list(input_vars)
+        weights = {}
+        for name, var in all_vars.items():
+            if var in input_vars:
+                weights[var] = self._cutset_weight(name, scale)
+        # an impossible event (p = 0) costs more than all other events together
+        impossible = sum(w for w in weights.values() if w is not None) + 1
+        weight_map = {-var: impossible if w is None else w
+                      for var, w in weights.items()}
+
+        with MaxSATSession(f, weight_map) as session:
+            while True:
+                sat, model = session.solve(budget=budget)
+                if not sat:
+                    return # (None if out of budget)
+                cutset = [model[var - 1] for var in input_vars]
+                session.block_positive_only(cutset)
+                yield f.assignment_to_set(cutset)
+
+
+    def _cutset_weight(self, name, scale):
+        """
+        Returns the integer MaxSAT weight of basic event `name`, the scaled
+        -log of its probability, or None if the probability is 0.
+        """
+        prob = self.probs[name]
+        if prob is None:
+            raise ValueError(f"Basic event '{name}' has no probability")
+        if not 0 <= prob <= 1:
+            raise ValueError(f"Basic event '{name}' has probability {prob}")
+        if prob == 0:
+            return None
+        return max(1, round(-math.log(prob) * scale))
+
+
+    def quantify(self, cutsets):
+        """
+        Quantifies the top event from the given minimal cut sets (e.g. from
+        compute_min_cutsets()) and the probabilities of the basic events, see
+        quantification.quantify().
+        """
+        return quantification.quantify(cutsets, self.probs)
+
+
+    def importance(self, cutsets=None, top_event=None):
+        """
+        Computes the Fussell-Vesely, Birnbaum, RAW and RRW importance of every
+        basic event in the cone of influence of the top event, from a single
+        list of minimal cut sets (see quantification.importance()).
+
+        Args:
+            cutsets: (Optional) The minimal cut sets to use, by default all
+              minimal cut sets are computed (once) with iter_min_cutsets().
+            top_event: (Optional) See compute_min_cutsets().
+
+        Returns:
+            A dictionary with the list of 'events', and an array per measure.
+        """
+        if cutsets is None:
+            cutsets = list(self.iter_min_cutsets(top_event=top_event))
+        if top_event is None:
+            top_event = self.top_event
+        top_event = self.aliases.get(top_event, top_event)
+        events = sorted(e for e in self.cone_of_influence(top_event)
+                        if self.node_types[e] == 'input')
+        return quantification.importance(cutsets, self.probs, events)
+
+
+    def update_probabilities(self):
+        """
+        Sets the probabilities of the basic events defined by an expression
+        (see the expressions module) to their point estimate, e.g. after
+        changing `mission_time`. Events with undefined parameters get
+        probability None.
+        """
+        cache = {}
+        for name, expression in self.expressions.items():
+            try:
+                self.probs[name] = expressions.evaluate(
+                    expression, self.parameters, self.mission_time, cache=cache)
+            except ValueError:
+                self.probs[name] = None
+
+
+    def sample_probabilities(self, num_samples, seed=None):
+        """
+        Samples the probabilities of the basic events from the distributions
+        in their expressions. Every parameter is sampled once per sample, and
+        shared by all events using it.
+
+        Returns:
+            Dictionary from event name to either a float (for events with a
+            fixed probability) or an array of `num_samples` samples, which can
+            be passed to quantify() and importance() of the quantification
+            module.
+        """
+        rng = np.random.default_rng(seed)
+        cache = {}
+        probs = dict(self.probs)
+        for name, expression in self.expressions.items():
+            probs[name] = expressions.evaluate(
+                expression, self.parameters, self.mission_time, num_samples,
+                rng, cache)
+        return probs
+
+
+    def uncertainty(self, cutsets, num_samples=10000, seed=None):
+        """
+        Propagates the uncertainty of the basic event probabilities to the top
+        event: the given minimal cut sets are quantified for all samples of
+        sample_probabilities() in one batched pass.
+
+        Returns:
+            A dictionary with the min-cut upper bound for every sample
+            ('samples'), its 'mean', standard deviation ('std'), and the 5th,
+            50th and 95th percentile ('p5', 'p50', 'p95').
+        """
+        probs = self.sample_probabilities(num_samples, seed)
+        samples = quantification.quantify(cutsets, probs)['mcub']
+        samples = np.broadcast_to(samples, (num_samples,))
+        p5, p50, p95 = np.percentile(samples, [5, 50, 95])
+        return {'samples': samples, 'mean': float(np.mean(samples)),
+                'std': float(np.std(samples)), 'p5': p5, 'p50': p50,
+                'p95': p95}
 
-            # we don't need a cardinality constraint if we solve with min-sat
-            if method != 'min-sat':
-                f_k.add_cardinality_constraint(at_most=k, variables=input_vars)
 
-            sat = True
-            while len(cutsets) < m:
-                sat, model = f_k.solve(method=method, minimize_vars=input_vars)
+    def _iter_min_cutsets(self, f, input_vars, method, cardinality, *,
+                          budget=None, grover_options=None):
+        """
+        Yields the minimal cut sets of formula `f` (as assignments over
+        `input_vars`) in order of non-decreasing size, using the given method.
+        Stops when the (optional) budget runs out, or after the empty cut set
+        (if the top event is always True, e.g. due to house events). The
+        'grover' method passes `grover_options` (see compute_min_cutsets())
+        to f.solve().
+        """
+        if method == 'classical':
+            yield from self._iter_min_cutsets_incremental(f, input_vars,
+                                                          cardinality, budget)
+            return
+        if method == 'min-sat':
+            yield from self._iter_min_cutsets_maxsat(f, input_vars, budget)
+            return
+
+        input_vars = list(input_vars)
+        options = {'verbose': False, **(grover_options or {})}
+        for k in range(len(input_vars) + 1):
+            f_k = f.copy()
+            f_k.add_cardinality_constraint(at_most=k, variables=input_vars)
+            if budget is not None:
+                budget.complete[k] = False
+
+            while True:
+                sat, model = f_k.solve(method=method, minimize_vars=input_vars,
+                                       budget=budget, **options)
+                if sat is None:
+                    return # out of budget
                 if not sat:
                     break
-                cutset = model[:len(input_vars)]
+                cutset = [model[var - 1] for var in input_vars]
 
                 # Block this cutset from current f_k and future f_k.
                 # Only block the positive literals (i.e. the actual cutset),
                 # this makes sure that only *minimal* cut sets are computed.
                 f_k.block_positive_only(cutset)
                 f.block_positive_only(cutset)
+                yield cutset
+                if k == 0: # the only minimal cut set
+                    if budget is not None:
+                        budget.mark_complete(0, len(input_vars))
+                    return
 
-                # add cutset and return if enough
-                cutsets.append(cutset)
-                if len(cutsets) == m:
-                    return f.assignments_to_sets(cutsets)
+            if budget is not None:
+                budget.complete[k] = True
 
-        return f.assignments_to_sets(cutsets)
+
+    def _iter_min_cutsets_maxsat(self, f, input_vars, budget=None):
+        """
+        Min-sat version of _iter_min_cutsets() which keeps a single MaxSAT
+        solver for the whole run (see MaxSATSession). Every call returns a
+        smallest cut set which is not blocked yet, so no cardinality
+        constraint is needed.
+        """
+        input_vars = list(input_vars)
+
+        # NOTE: RC2 has issues with negative weights, so instead of punishing
+        # variables set to True we reward variables set to False (see
+        # CNF._solve_min_sat()).
+        weight_map = {-var: 1 for var in input_vars}
+        order = 1
+        with MaxSATSession(f, weight_map) as session:
+            while True:
+                if budget is not None:
+                    budget.complete[order] = False
+                sat, model = session.solve(budget=budget)
+                if sat is None:
+                    return # out of budget
+                if not sat:
+                    break
+                cutset = [model[var - 1] for var in input_vars]
+                size = len([lit for lit in cutset if lit > 0])
+
+                # all orders below the size of this cut set are done
+                if budget is not None:
+                    budget.mark_complete(order, size - 1)
+                order = max(order, size)
+
+                session.block_positive_only(cutset)
+                yield cutset
+                if size == 0:
+                    break # the only minimal cut set
+
+        if budget is not None:
+            budget.mark_complete(order, len(input_vars))
+
+
+    def _iter_min_cutsets_incremental(self, f, input_vars, cardinality,
+                                      budget=None):
+        """
+        Classical version of _iter_min_cutsets() which keeps a single live
+        SAT solver for the whole run (see SATSession), instead of re-loading
+        the formula for every cut set. The SAT session is freed when the
+        generator is exhausted or closed.
+        """
+        if cardinality not in ('totalizer', 'selector'):
+            raise ValueError(f"Unknown cardinality mode '{cardinality}'")
+
+        input_vars = list(input_vars)
+        with SATSession(f) as session:
+            for k in range(len(input_vars) + 1):
+                # cardinality constraint <= k, only active under `assumptions`
+                if k == 0:
+                    assumptions = [-var for var in input_vars]
+                elif cardinality == 'totalizer':
+                    assumptions = session.cardinality_bound(k, input_vars)
+                else:
+                    selector = session.add_cardinality_constraint(k, input_vars)
+                    assumptions = [selector]
+                if budget is not None:
+                    budget.complete[k] = False
+
+                while True:
+                    sat, model = session.solve(assumptions=assumptions,
+                                               budget=budget)
+                    if sat is None:
+                        return # out of budget
+                    if not sat:
+                        break
+                    cutset = [model[var - 1] for var in input_vars]
+
+                    # block (only) the positive literals of this cutset for
+                    # all future calls, this keeps the cut sets minimal
+                    session.block_positive_only(cutset)
+                    yield cutset
+                    if k == 0: # the only minimal cut set
+                        if budget is not None:
+                            budget.mark_complete(0, len(input_vars))
+                        return
+
+                if budget is not None:
+                    budget.complete[k] = True
+
+                # the next order uses a looser bound, switch this one off
+                if cardinality == 'selector' and k > 0:
+                    session.retire(selector)
 
 
     @classmethod
-    def load_from_xml(cls, filepath):
+    def load_from_xml(cls, filepath, verbose=False):
         """
         Loads an FT from a given XML file in the Open-PSA Model Exchange Format.
+
+        The file is read in a single streaming pass: nodes are added as soon as
+        their XML element is closed, after which the element is discarded, so
+        memory use stays flat on large files. The number of parsed nodes and
+        the parse rate (nodes per second) are stored in `parse_stats`, and
+        printed if `verbose` is set.
         """
 
         # 1. create new FaultTree
         ft = FaultTree()
 
-        # 2. load xml
-        xml = ElementTree.parse(filepath)
+        # 2. stream the xml, adding basic events and gates on the way
+        top_events = ft._stream_xml(filepath)
 
-        # 3. get all basic events
-        basic_events = xml.iter('define-basic-event')
-        for e in basic_events:
-            ft._parse_basic_event_xml(e)
+        # 3. set top event
+        assert len(top_events) == 1
+        ft.set_top_event(top_events[0])
+        ft.update_probabilities()
 
-        # 4. get all gates
-        gates = xml.iter('define-gate')
-        for g in gates:
-            ft._parse_gate_xml(g)
+        if verbose:
+            print(f"Parsed {ft.parse_stats['nodes']} nodes from {filepath} "
+                  f"in {ft.parse_stats['seconds']:.3f}s "
+                  f"({ft.parse_stats['nodes_per_second']:.0f} nodes/s)")
+
+        return ft
 
-        # 5. get top event
-        ft._parse_top_event_xml(xml)
+
+    @classmethod
+    def load_from_files(cls, paths, top_event=None, cache=None, verbose=False):
+        """
+        Loads an FT which is split over several XML files in the Open-PSA Model
+        Exchange Format, e.g. with the basic events in a separate file, or with
+        transfer-in gates referring to fault trees defined in other files.
+        References between the files are resolved by name.
+
+        Every file is parsed only once into a ModelCache, so loading several
+        trees which share (for example) a file of basic events doesn't parse
+        that file again.
+
+        Args:
+            paths: A directory (all .xml files in it are loaded), a single
+              file, or a list of files.
+            top_event: (Optional) The name of the top event. If not given, this
+              is the top event of the one <define-fault-tree> which is not
+              used as an input anywhere else.
+            cache: (Optional) The ModelCache to use, by default a cache shared
+              between all calls is used.
+        """
+        if cache is None:
+            cache = MODEL_CACHE
+        filepaths = model_files(paths)
+
+        # 1. combine the (cached) contents of all files
+        ft = FaultTree()
+        top_events = []
+        num_nodes, seconds = 0, 0.0
+        def parse(filepath):
+            fragment = FaultTree()
+            return fragment, fragment._stream_xml(filepath)
+
+        for filepath in filepaths:
+            fragment, fragment_tops, parsed = cache.get(filepath, parse)
+            ft._merge(fragment)
+            top_events += fragment_tops
+            if parsed:
+                num_nodes += fragment.parse_stats['nodes']
+                seconds += fragment.parse_stats['seconds']
+
+        # 2. check that every referenced event is defined in some file
+        undefined = [node for node in ft.graph if node not in ft.node_types]
+        if len(undefined) > 0:
+            raise ValueError(f"Events {undefined} are used but not defined")
+
+        # 3. set top event
+        if top_event is None:
+            roots = [e for e in dict.fromkeys(top_events)
+                     if ft.graph.in_degree(e) == 0]
+            if len(roots) != 1:
+                raise ValueError(f"Cannot choose top event from {roots}, "
+                                 "please give `top_event`")
+            top_event = roots[0]
+        ft.set_top_event(top_event)
+        ft.update_probabilities()
+
+        ft.parse_stats['nodes'] = num_nodes
+        ft.parse_stats['seconds'] = seconds
+        ft.parse_stats['nodes_per_second'] = num_nodes / max(seconds, 1e-9)
+        if verbose:
+            print(f"Parsed {num_nodes} nodes from {len(filepaths)} file(s) "
+                  f"in {seconds:.3f}s ({ft.graph.number_of_nodes()} nodes "
+                  "in total)")
 
         return ft
 
 
+    def _merge(self, other):
+        """
+        Adds all nodes and edges of the FaultTree `other` to self. Events and
+        parameters defined in both have to be defined identically.
+        """
+        for node in other.node_types.keys() & self.node_types.keys():
+            if self._definition(node) != other._definition(node):
+                raise ValueError(f"Event '{node}' is defined differently in "
+                                 "several files")
+        for name in other.parameters.keys() & self.parameters.keys():
+            if self.parameters[name] != other.parameters[name]:
+                raise ValueError(f"Parameter '{name}' is defined differently "
+                                 "in several files")
+        self.graph.update(other.graph)
+        self.basic_events.update(other.basic_events)
+        self.probs.update(other.probs)
+        self.expressions.update(other.expressions)
+        self.parameters.update(other.parameters)
+        self.node_types.update(other.node_types)
+        self.thresholds.update(other.thresholds)
+        self.house_events.update(other.house_events)
+
+
+    def _definition(self, node):
+        """
+        Returns everything that defines a node: its type, inputs, threshold,
+        probability (or expression) and house event value.
+        """
+        return (self.node_types[node], set(self.graph.successors(node)),
+                self.thresholds.get(node), self.probs.get(node),
+                self.expressions.get(node), self.house_events.get(node))
+
+
+    def _stream_xml(self, filepath):
+        """
+        Parses the given XML file in a single pass with iterparse, adding all
+        <define-basic-event>, <define-gate>, <define-house-event> and
+        <define-parameter> elements to self as soon as they are closed.
+        Finished elements are cleared and removed from their parent to keep
+        the partially built tree small. Defining the same event or parameter
+        twice in one file is an error, as it is across files (see _merge).
+
+        Returns:
+            The names of the top events of all <define-fault-tree> elements,
+            where the top event is taken to be the first element under the
+            <define-fault-tree> element.
+        """
+        start_time = time.perf_counter()
+        parsers = {'define-basic-event': self._parse_basic_event_xml,
+                   'define-gate': self._parse_gate_xml,
+                   'define-house-event': self._parse_house_event_xml}
+        num_nodes = 0
+        top_events = []
+        stack = [] # currently open elements
+        awaiting_top = False # True until first child of <define-fault-tree>
+        for event, elem in ElementTree.iterparse(filepath, events=('start', 'end')):
+            if event == 'start':
+                if awaiting_top and stack[-1].tag == 'define-fault-tree':
+                    top_events.append(elem.attrib['name'])
+                awaiting_top = elem.tag == 'define-fault-tree'
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag in parsers:
+                if elem.attrib['name'] in self.node_types:
+                    raise ValueError(f"Event '{elem.attrib['name']}' is defined more than once in {filepath}")
+                parsers[elem.tag](elem)
+                num_nodes += 1
+            elif elem.tag == 'define-parameter':
+                if elem.attrib['name'] in self.parameters:
+                    raise ValueError(f"Parameter '{elem.attrib['name']}' is defined more than once in {filepath}")
+                self.parameters[elem.attrib['name']] = expressions.parse(
+                    next(c for c in elem if c.tag not in _NON_EXPRESSIONS))
+            else:
+                continue
+
+            # done with this element
+            elem.clear()
+            if len(stack) > 0:
+                stack[-1].remove(elem)
+
+        seconds = time.perf_counter() - start_time
+        self.parse_stats['nodes'] = num_nodes
+        self.parse_stats['seconds'] = seconds
+        self.parse_stats['nodes_per_second'] = num_nodes / max(seconds, 1e-9)
+        return top_events
+
+
     def _parse_basic_event_xml(self, xml_element):
         """
-        Gets the relevant info from a <define-basic-event> XML element.
-        Currently only gets the event name, not the probability.
+        Gets the relevant info from a <define-basic-event> XML element. The
+        probability is read from a <float> element. Other expressions are
+        stored in `expressions`, and evaluated by update_probabilities() once
+        all parameters are known. Events without a (supported) expression get
+        probability None.
         """
-        self.add_basic_event(xml_element.attrib['name'], prob=0)
+        name = xml_element.attrib['name']
+        prob = None
+        for child in xml_element:
+            if child.tag in _NON_EXPRESSIONS:
+                continue
+            if child.tag == 'float':
+                prob = float(child.attrib['value'])
+            else:
+                try:
+                    self.expressions[name] = expressions.parse(child)
+                except ValueError:
+                    pass
+            break
+        self.add_basic_event(name, prob=prob)
+
+
+    def _parse_house_event_xml(self, xml_element):
+        """
+        Gets the relevant info from a <define-house-event> XML element. House
+        events without a <constant> are False.
+        """
+        value = False
+        constant = xml_element.find('constant')
+        if constant is not None:
+            value = constant.attrib['value'] == 'true'
+        self.add_house_event(xml_element.attrib['name'], value)
 
 
     def _parse_gate_xml(self, xml_element):
@@ -205,6 +940,12 @@ class FaultTree:
                 gate = child
                 gate_type = gate.tag
 
+        # a gate which is just a reference to another event (a transfer-in)
+        # is added as an OR gate with a single input
+        if gate_type in ('event', 'gate', 'basic-event'):
+            self.add_gate(name, 'or', [gate.attrib['name']])
+            return
+
         if gate_type not in self._suported_gates:
             raise ValueError(f"Gate type '{gate_type}' currently not supported")
 
@@ -213,18 +954,12 @@ class FaultTree:
         for i in gate: # (the xml element is enumerable)
             inputs.append(i.attrib['name'])
 
-        self.add_gate(name, gate_type, inputs)
-
-    def _parse_top_event_xml(self, xml_element):
-        """
-        Sets the top event of the fault tree, assuming the first gate under
-        the <define-fault-tree> element is the top event.
-        """
-        ft_defs = list(xml_element.iter('define-fault-tree'))
-        assert len(ft_defs) == 1
-        event_name = list(ft_defs[0])[0].attrib['name']
-        self.set_top_event(event_name)
+        # k for k-out-of-n gates
+        k = None
+        if gate_type == 'atleast':
+            k = int(gate.attrib['min'])
 
+        self.add_gate(name, gate_type, inputs, k)
 
     def save_as_image(self, output_file):
         """
@@ -232,25 +967,33 @@ class FaultTree:
         graphviz and pydot.
         """
 
-        # split the nodes into and-gates, or-gates, and basic events
+        # split the nodes into and-gates, or-gates, other gates, and basic
+        # events
         and_nodes   = []
         or_nodes    = []
+        other_nodes = []
         input_nodes = []
         for node in self.graph:
-            if self.node_types[node] == 'input':
+            if self.node_types[node] in ('input', 'house'):
                 input_nodes.append(node)
-            if self.node_types[node] == 'and':
+            elif self.node_types[node] == 'and':
                 and_nodes.append(node)
             elif self.node_types[node] == 'or':
                 or_nodes.append(node)
+            else:
+                other_nodes.append(node)
 
         # draw the graph
         pos = graphviz_layout(self.graph, prog='dot')
         nx.draw_networkx_nodes(self.graph, pos, nodelist=and_nodes, node_shape='^')
         nx.draw_networkx_nodes(self.graph, pos, nodelist=or_nodes, node_shape='v')
+        nx.draw_networkx_nodes(self.graph, pos, nodelist=other_nodes, node_shape='o')
         nx.draw_networkx_nodes(self.graph, pos, nodelist=input_nodes, node_shape='s')
         nx.draw_networkx_edges(self.graph, pos)
         nx.draw_networkx_labels(self.graph, pos, font_size=6)
         plt.tight_layout()
         plt.savefig(output_file, dpi=300)
         plt.clf()
+
+
+MODEL_CACHE = ModelCache()
@@ -0,0 +1,196 @@
+"""
+Grover search for satisfying assignments with pluggable backends. The search
+loop is independent of how the Grover iterations are carried out: a backend
+turns a formula (a CNF or CircuitFormula) into a function sampling the
+search qubits after r iterations. MyQLMBackend simulates the compiled
+circuits gate by gate on a MyQLM QPU, NumpyBackend applies the iterations
+directly to a state vector of the search qubits.
+"""
+import math
+import random
+
+import numpy as np
+from qat.qpus import get_default_qpu
+
+import ft_2_quantum_sat.myqlm_functions as myqlm
+
+# largest number of variables for which the NumPy backend evaluates all 2^n
+# assignments, which takes about n + 8 bytes per assignment
+MAX_MASK_VARS = 24
+
+
+def check_mask_size(num_vars, max_vars=MAX_MASK_VARS):
+    """
+    Raises a ValueError if the 2^num_vars assignments of a formula are too
+    many to evaluate at once (see CNF.satisfying_mask()).
+    """
+    if num_vars > max_vars:
+        raise ValueError(f"Cannot evaluate all assignments of {num_vars} "
+                         f"variables at once, at most {max_vars} are "
+                         "supported")
+
+
+class MyQLMBackend:
+    """
+    Runs the compiled Grover circuits of a formula (see
+    CNF.grover_circuits()) on a MyQLM QPU.
+    """
+
+    def __init__(self, qpu=None):
+        """
+        Args:
+            qpu: (Optional) The QPU to submit the circuits to, by default the
+              default QPU of MyQLM.
+        """
+        self.qpu = qpu
+
+
+    def _submit(self, circuits, r, shots):
+        """
+        Submits the circuit with r iterations to the QPU, measuring only the
+        search qubits `shots` times (or exactly if `shots` is 0).
+        """
+        qpu = self.qpu if self.qpu is not None else get_default_qpu()
+        job = circuits.circuit(r).to_job(nbshots=shots,
+                                         qubits=list(range(circuits.n)))
+        return qpu.submit(job)
+
+
+    def sampler(self, formula, oracle_options=None, verbose=False):
+        """
+        Returns a function sample(r, shots), which measures the search qubits
+        `shots` times after r Grover iterations, and returns the most
+        frequent measurement as an assignment (a list of literals).
+
+        Args:
+            formula: A CNF or CircuitFormula.
+            oracle_options: (Optional) Dictionary of keyword arguments for
+              formula.grover_circuits(), e.g. the `batch_size` of a CNF.
+            verbose: (Optional) If True, prints the statistics of the circuit
+              of one Grover iteration (see myqlm_functions.circuit_stats()).
+        """
+        circuits = formula.grover_circuits(**(oracle_options or {}))
+        n = circuits.n
+        if verbose:
+            print(f"Grover iteration: {myqlm.circuit_stats(circuits.iteration)}")
+
+        def sample(r, shots):
+            result = self._submit(circuits, r, shots)
+            best = max(result, key=lambda sample: sample.probability)
+            bitstring = best.state.bitstring
+            return [var if bitstring[var - 1] == '1' else -var
+                    for var in range(1, n + 1)]
+        return sample
+
+
+    def probabilities(self, formula, r, oracle_options=None):
+        """
+        Returns the exact probabilities of measuring every assignment after r
+        Grover iterations, indexed as in NumpyBackend.probabilities().
+        """
+        circuits = formula.grover_circuits(**(oracle_options or {}))
+        probs = np.zeros(2**circuits.n)
+        for sample in self._submit(circuits, r, 0):
+            bits = sample.state.bitstring[:circuits.n]
+            probs[int(bits[::-1], 2)] += sample.probability
+        return probs
+
+
+class NumpyBackend:
+    """
+    Applies the Grover iterations to a NumPy state vector of the search
+    qubits only, without simulating gates. The oracle is a precomputed mask
+    of the satisfying assignments (see CNF.satisfying_mask()), so an
+    iteration is an O(2^n) array operation. This needs memory for 2^n
+    amplitudes, but is much faster than a gate level simulation, and serves
+    as a reference for the MyQLM results.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Args:
+            seed: (Optional) Seed for sampling the measurements.
+        """
+        self.rng = np.random.default_rng(seed)
+
+
+    @staticmethod
+    def _probabilities(mask, r):
+        """
+        Applies r Grover iterations with the oracle given by `mask` to the
+        uniform superposition, and returns the measurement probabilities.
+        """
+        n = mask.size.bit_length() - 1
+        amplitudes = np.full(mask.size, 2**(-n / 2))
+        for _ in range(r):
+            amplitudes[mask] *= -1 # oracle
+            amplitudes = 2 * np.mean(amplitudes) - amplitudes # diffusion
+        probs = amplitudes**2
+        return probs / np.sum(probs)
+
+
+    def sampler(self, formula, oracle_options=None, verbose=False):
+        """
+        Returns a function sample(r, shots), see MyQLMBackend.sampler(). No
+        oracle is built, so `oracle_options` are ignored.
+        """
+        # pylint: disable=unused-argument
+        mask = formula.satisfying_mask()
+        n = formula.num_vars
+        if verbose:
+            print(f"Grover iteration: NumPy state vector of 2^{n} amplitudes")
+
+        def sample(r, shots):
+            counts = self.rng.multinomial(shots, self._probabilities(mask, r))
+            index = int(np.argmax(counts))
+            return [var if (index >> (var - 1)) & 1 else -var
+                    for var in range(1, n + 1)]
+        return sample
+
+
+    def probabilities(self, formula, r, oracle_options=None):
+        """
+        Returns the probabilities of measuring every assignment after r
+        Grover iterations: entry i is the probability of the assignment in
+        which variable v is True iff bit v - 1 of i is 1.
+        """
+        # pylint: disable=unused-argument
+        return self._probabilities(formula.satisfying_mask(), r)
+
+
+def grover_search(formula, backend=None, shots=100, oracle_options=None,
+                  verbose=False):
+    """
+    Searches for an assignment satisfying the formula with Grover's
+    algorithm, for an unknown number of solutions (see
+    https://arxiv.org/abs/quant-ph/9605034).
+
+    Args:
+        formula: A CNF or CircuitFormula.
+        backend: (Optional) A MyQLMBackend or NumpyBackend, by default a
+          MyQLMBackend on the default QPU.
+        shots: (Optional) The number of measurements per number of
+          iterations.
+        oracle_options: (Optional) See MyQLMBackend.sampler().
+        verbose: (Optional) See MyQLMBackend.sampler().
+
+    Returns:
+        A satisfying assignment as a list of literals, or None if none was
+        found.
+    """
+    if backend is None:
+        backend = MyQLMBackend()
+    sample = backend.sampler(formula, oracle_options, verbose)
+
+    m = 1
+    _lambda = 1.2
+    while m <= math.sqrt(2**formula.num_vars):
+        r = random.randint(1, round(m))
+
+        # check the most frequent measurement
+        assignment = sample(r, shots)
+        if formula.is_satisfying(assignment):
+            return assignment
+        m *= _lambda
+
+    return None
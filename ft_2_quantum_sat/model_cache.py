@@ -0,0 +1,73 @@
+"""
+In-memory cache of parsed XML model files, so models split over several
+files (see FaultTree.load_from_files()) can share files without parsing them
+again.
+"""
+import os
+
+
+def model_files(paths):
+    """
+    Returns the XML files to load for the given paths.
+
+    Args:
+        paths: A directory (all .xml files in it are loaded), a single file,
+          or a list of files.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for file_name in sorted(os.listdir(path)):
+                if file_name.endswith('.xml'):
+                    filepaths.append(os.path.join(path, file_name))
+        else:
+            filepaths.append(path)
+    return filepaths
+
+
+class ModelCache:
+    """
+    In-memory cache of parsed XML model files, shared between calls to
+    FaultTree.load_from_files(). Every file is kept as a partial FaultTree
+    (together with the top events of the fault trees it defines), and is only
+    parsed again when it changes on disk.
+    """
+
+    def __init__(self):
+        self.entries = {} # map: absolute path -> (stamp, fragment, top events)
+        self.num_parsed = 0
+
+
+    def get(self, filepath, parse):
+        """
+        Gets the contents of the given file, parsing it if it is not cached.
+
+        Args:
+            filepath: The path of the XML file.
+            parse: Function parsing a file, which returns a tuple (fragment,
+              top_events).
+
+        Returns:
+            A tuple (fragment, top_events, parsed), with `parsed` True if the
+            file had to be parsed for this call.
+        """
+        key = os.path.abspath(filepath)
+        stat = os.stat(key)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if key in self.entries and self.entries[key][0] == stamp:
+            _, fragment, top_events = self.entries[key]
+            return fragment, top_events, False
+
+        fragment, top_events = parse(key)
+        self.entries[key] = (stamp, fragment, top_events)
+        self.num_parsed += 1
+        return fragment, top_events, True
+
+
+    def clear(self):
+        """
+        Removes all files from the cache.
+        """
+        self.entries.clear()
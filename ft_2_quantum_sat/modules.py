@@ -0,0 +1,213 @@
+"""
+Modularisation of fault trees. A module is a gate whose sub-DAG shares no
+node with the rest of the fault tree, so its cut sets can be computed on their
+own and combined afterwards. Cut sets are then computed with one small SAT
+problem per module instead of one problem for the whole fault tree.
+"""
+import itertools
+import networkx as nx
+
+
+def find_modules(ft, top_event=None):
+    """
+    Finds the modules of a fault tree with the linear-time algorithm of
+    Dutuit and Rauzy. A depth first search from the top event records for
+    every node the date of its first visit, the date at which the search
+    leaves it for the first time, and the date of its last visit. A gate is a
+    module iff all its descendants are first visited after, and last visited
+    before, the search leaves the gate.
+
+    Args:
+        ft: The FaultTree.
+        top_event: (Optional) Search from this node instead of the top event.
+
+    Returns:
+        The list of gates which are modules, the top event first.
+    """
+    top = top_event if top_event is not None else ft.top_event
+    top = ft.aliases.get(top, top)
+
+    # 1. depth first search, stack entries are (node, leaving)
+    first, leave, last = {}, {}, {}
+    date = 0
+    stack = [(top, False)]
+    while len(stack) > 0:
+        node, leaving = stack.pop()
+        date += 1
+        if leaving:
+            leave[node] = last[node] = date
+        elif node in first:
+            last[node] = date
+        elif ft.node_types[node] in ('input', 'house'):
+            first[node] = leave[node] = last[node] = date
+        else:
+            first[node] = last[node] = date
+            stack.append((node, True))
+            for child in reversed(list(ft.get_gate_inputs(node))):
+                stack.append((child, False))
+
+    # 2. bottom-up: min first visit and max last visit over all descendants
+    order = list(nx.topological_sort(ft.graph.subgraph(first)))
+    min_first, max_last = {}, {}
+    for node in reversed(order):
+        children = list(ft.get_gate_inputs(node))
+        min_first[node] = min((min(first[c], min_first[c]) for c in children),
+                              default=float('inf'))
+        max_last[node] = max((max(last[c], max_last[c]) for c in children),
+                              default=float('-inf'))
+
+    return [node for node in order
+            if ft.node_types[node] not in ('input', 'house')
+            and min_first[node] > first[node]
+            and max_last[node] < leave[node]]
+
+
+def compute_min_cutsets_modular(ft, m, top_event=None,
+                                cardinality='totalizer', encoding='tseitin'):
+    """
+    Computes the `m` smallest cut sets of a fault tree one module at a time
+    (see find_modules()). Every module is encoded as its own CNF formula, in
+    which the modules directly below it are single (pseudo) basic events. The
+    cut sets of the modules are combined by replacing each pseudo event by
+    the cut sets of its module. This is done for a growing bound K on the cut
+    set order, until at least `m` cut sets are found.
+
+    Only coherent fault trees (without 'not' gates) are supported, for these
+    the combined cut sets are minimal again.
+
+    Args:
+        ft: The FaultTree.
+        m: The number of cutsets to compute.
+        top_event: (Optional) Compute the cut sets of this node instead of
+          `ft.top_event`.
+        cardinality: (Optional) See FaultTree.compute_min_cutsets().
+        encoding: (Optional) See FaultTree.compute_min_cutsets().
+
+    Returns:
+        The cut sets as a list of sets of basic event names, in order of
+        non-decreasing size.
+    """
+    top = top_event if top_event is not None else ft.top_event
+    top = ft.aliases.get(top, top)
+    if top in ft.constants:
+        return [set()] if ft.constants[top] and m > 0 else []
+    if ft.node_types[top] == 'input':
+        return [{top}] if m > 0 else []
+    cone = ft.cone_of_influence(top)
+    if any(ft.node_types[node] == 'not' for node in cone):
+        raise ValueError("Modular cut set computation needs a coherent "
+                         "fault tree (no 'not' gates)")
+
+    names = find_modules(ft, top)
+    modules = {name: _Module(ft, name, names, cardinality, encoding)
+               for name in names}
+    num_events = len([n for n in cone if ft.node_types[n] == 'input'])
+
+    cutsets = []
+    try:
+        for bound in range(1, num_events + 1):
+            # once all local cut sets are known, expand them without bound
+            done = all(module.exhausted for module in modules.values())
+            cutsets = _expand(modules, top, num_events if done else bound, {})
+            if any(set() in module.found for module in modules.values()):
+                cutsets = _minimal(cutsets)
+            if done or len(cutsets) >= m:
+                break
+    finally:
+        for module in modules.values():
+            module.close()
+
+    cutsets.sort(key=len)
+    return cutsets[:m]
+
+
+def _minimal(cutsets):
+    """
+    Returns the cut sets which contain no other cut set. The combined cut sets
+    are only minimal by themselves if no module has the empty cut set.
+    """
+    result = []
+    for cutset in sorted(cutsets, key=len):
+        if not any(other <= cutset for other in result):
+            result.append(cutset)
+    return result
+
+
+def _expand(modules, name, bound, memo):
+    """
+    Returns all minimal cut sets of module `name` with at most `bound` basic
+    events, by expanding the pseudo events in the cut sets of the module.
+    """
+    if (name, bound) in memo:
+        return memo[(name, bound)]
+    result = []
+    for local in modules[name].cutsets(bound):
+        events = local - modules.keys()
+        pseudo = sorted(local & modules.keys())
+        # every other pseudo event needs at least one basic event as well
+        sub_bound = bound - len(events) - (len(pseudo) - 1)
+        parts = [_expand(modules, p, sub_bound, memo) for p in pseudo]
+        for combination in itertools.product(*parts):
+            cutset = events.union(*combination)
+            if len(cutset) <= bound:
+                result.append(cutset)
+    memo[(name, bound)] = result
+    return result
+
+
+class _Module:
+    """
+    A single module, encoded as a small fault tree of its own. Its (local)
+    cut sets are enumerated lazily in order of non-decreasing size.
+    """
+
+    def __init__(self, ft, name, modules, cardinality, encoding):
+        sub_ft = type(ft)()
+        sub_ft.set_top_event(name)
+        seen = {name}
+        stack = [name]
+        while len(stack) > 0:
+            gate = stack.pop()
+            sub_ft.add_gate(gate, ft.node_types[gate], ft.get_gate_inputs(gate),
+                            ft.thresholds.get(gate))
+            for child in ft.get_gate_inputs(gate):
+                if child in seen:
+                    continue
+                seen.add(child)
+                if child in modules:
+                    sub_ft.add_basic_event(child, None)
+                elif ft.node_types[child] == 'input':
+                    sub_ft.add_basic_event(child, ft.probs[child])
+                elif ft.node_types[child] == 'house':
+                    sub_ft.add_house_event(child, ft.house_events[child])
+                else:
+                    stack.append(child)
+
+        self.generator = sub_ft.iter_min_cutsets(cardinality=cardinality,
+                                                 encoding=encoding)
+        self.found = []
+        self.exhausted = False
+
+
+    def cutsets(self, bound):
+        """
+        Returns the local cut sets of this module with at most `bound`
+        elements, enumerating more of them if needed.
+        """
+        while not self.exhausted and \
+                (len(self.found) == 0 or len(self.found[-1]) <= bound):
+            cutset = next(self.generator, None)
+            if cutset is None:
+                self.exhausted = True
+            else:
+                self.found.append(cutset)
+                # the empty cut set (the module is always True) is the only one
+                self.exhausted = len(cutset) == 0
+        return [c for c in self.found if len(c) <= bound]
+
+
+    def close(self):
+        """
+        Frees the SAT solver of this module.
+        """
+        self.generator.close()
@@ -1,72 +1,292 @@
 """
 MyQLM functionality needed for SAT solving
 """
+import functools
+from collections import OrderedDict
 
-from qat.lang.AQASM import QRoutine, H, X, Z
-from qat.lang.AQASM import QBoolArray
-#from qat.qpus import get_default_qpu
+from qat.lang.AQASM import Program, QRoutine, H, X, Z
 
 
-def _lit_to_qbool(lit, qbools):
+def cnf_routine(n, clauses, batch_size=None, reuse_ancillas=False):
     """
-    For a CNF literal, returns the corresponding QBool literal.
+    Constructs a routine on n + 1 wires, which flips the last wire iff the
+    first n wires satisfy the given CNF formula. See oracle_from_clauses()
+    for the arguments.
 
-    The CNF literals are numbered from 1 to n, while qbools start at 0, so
-    the index is shifted by -1.
+    MyQLM's QBool expressions can't be used for this routine: evaluating an
+    expression into an output qubit gives wrong results for some inputs, and
+    controlled QBool routines with ancillas fail to link, so only the phase
+    of a QBool expression is available, which IncrementalOracle can't extend
+    with blocking clauses.
+    """
+    return _clause_routine(n, clauses, batch_size, reuse_ancillas, phase=False)
+
+
+def oracle_from_clauses(n, clauses, batch_size=None, reuse_ancillas=False):
+    """
+    Constructs a phase oracle from the given CNF formula with explicit
+    multi-controlled gates. Every clause is computed into an ancilla, the
+    phase is flipped iff all clause ancillas are True, and the ancillas are
+    uncomputed.
+
+    Simulating a gate with c controls takes a dense matrix of size 2^(c+1),
+    so the number of controls is kept small by clause batching: the clauses
+    are ANDed in batches of `batch_size` into further ancillas, which are
+    ANDed in batches again, until a single batch is left.
+
+    Args:
+        n: The number of variables.
+        clauses: The clauses, as lists of literals.
+        batch_size: (Optional) The number of ancillas ANDed by one gate. By
+          default all clauses are ANDed at once.
+        reuse_ancillas: (Optional) If True (and with a `batch_size`), the
+          clauses of each batch are computed into the same `batch_size`
+          ancillas, and uncomputed once the batch is ANDed. This needs
+          fewer qubits, at the cost of computing every clause twice more.
+    """
+    return _clause_routine(n, clauses, batch_size, reuse_ancillas, phase=True)
+
+
+def _clause_gates(n, clauses, batch_size, reuse_ancillas):
+    """
+    Returns the gates which compute a CNF formula with clause ancillas (see
+    oracle_from_clauses()), as (controls, target line) for _mcx(), with the
+    ancillas as lines n + 1, n + 2, ...
+
+    Returns:
+        A tuple (gates, num_ancillas, lines): applying the gates leaves the
+        AND of `lines` equal to the formula.
+    """
+    clauses = [list(clause) for clause in clauses]
+    if batch_size is None:
+        batch_size = len(clauses) # a single AND, also of 0 or 1 clauses
+    elif batch_size < 2:
+        raise ValueError(f"Batch size '{batch_size}' is smaller than 2")
+    num_ancillas = 0
+
+    def new_line():
+        nonlocal num_ancillas
+        num_ancillas += 1
+        return n + num_ancillas
+
+    def compute_clauses(chunk, lines):
+        # clause = NOT(AND of the negated literals)
+        gates = []
+        for clause, line in zip(chunk, lines):
+            gates += [([-lit for lit in clause], line), ([], line)]
+        return gates
+
+    gates = []
+    if reuse_ancillas and len(clauses) > batch_size:
+        shared = [new_line() for _ in range(batch_size)]
+        lines = []
+        for i in range(0, len(clauses), batch_size):
+            clause_gates = compute_clauses(clauses[i:i + batch_size], shared)
+            lines.append(new_line())
+            gates += clause_gates
+            gates.append((shared[:len(clause_gates) // 2], lines[-1]))
+            gates += reversed(clause_gates)
+    else:
+        lines = [new_line() for _ in clauses]
+        gates += compute_clauses(clauses, lines)
+
+    while len(lines) > batch_size:
+        batches = [lines[i:i + batch_size]
+                   for i in range(0, len(lines), batch_size)]
+        lines = [new_line() for _ in batches]
+        gates += [(batch, line) for batch, line in zip(batches, lines)]
+    return gates, num_ancillas, lines
+
+
+def _clause_routine(n, clauses, batch_size, reuse_ancillas, phase):
+    """
+    Builds the routine of oracle_from_clauses() (if `phase` is True) or of
+    cnf_routine().
+    """
+    gates, num_ancillas, lines = _clause_gates(n, clauses, batch_size,
+                                               reuse_ancillas)
+    routine = QRoutine()
+    inputs = routine.new_wires(n)
+    result = None if phase else routine.new_wires(1)
+    ancillas = routine.new_wires(num_ancillas)
+    if num_ancillas > 0:
+        routine.set_ancillae(ancillas)
+    wires = list(inputs) + list(ancillas)
+
+    for controls, line in gates:
+        _mcx(controls, wires[line - 1], wires)
+    if not phase:
+        _mcx(lines, result[0], wires)
+    elif len(lines) > 0:
+        Z.ctrl(len(lines) - 1)(*(wires[line - 1] for line in lines))
+    for controls, line in reversed(gates):
+        _mcx(controls, wires[line - 1], wires)
+    return routine
 
-    E.g. 3 --> q[2], -5 --> ~q[4]
+
+def circuit_stats(circuit):
+    """
+    Returns statistics of a compiled circuit (e.g. GroverCircuits.iteration),
+    to compare oracle constructions: a dictionary with the number of
+    'qubits', 'gates' and 'controlled' gates, the 'max_controls' of a gate,
+    and the 'depth', i.e. the number of layers of gates on disjoint qubits.
     """
-    if lit > 0:
-        return qbools[lit-1]
+    levels = [0] * circuit.nbqbits
+    max_controls = 0
+    controlled = 0
+    for op in circuit.ops:
+        level = 1 + max((levels[q] for q in op.qbits), default=0)
+        for qubit in op.qbits:
+            levels[qubit] = level
+        controls = len(op.qbits) - 1
+        max_controls = max(max_controls, controls)
+        controlled += controls > 0
+    return {
+        'qubits': circuit.nbqbits,
+        'gates': len(circuit.ops),
+        'controlled': controlled,
+        'max_controls': max_controls,
+        'depth': max(levels, default=0),
+    }
+
+
+def _mcx(controls, target, wires):
+    """
+    Flips wire `target` iff all `controls` are True. Controls are literals
+    over the wires, numbered from 1 (e.g. -3 means wires[2] is False).
+    """
+    negated = [wires[-lit - 1] for lit in controls if lit < 0]
+    for wire in negated:
+        X(wire)
+    if len(controls) == 0:
+        X(target)
     else:
-        return ~qbools[abs(lit)-1]
+        X.ctrl(len(controls))(*(wires[abs(lit) - 1] for lit in controls),
+                              target)
+    for wire in negated:
+        X(wire)
 
 
-def _clause_to_qbool_clause(clause, qbools):
+def _increment(control, lines):
     """
-    For a CNF clause, return the corresponding QClause expression.
+    Returns the multi-controlled X gates, as (controls, target line), which
+    add 1 to the binary counter on `lines` (least significant bit first) iff
+    the literal `control` is True: bit j flips iff all lower bits are 1.
     """
-    lit_iterator = iter(clause)
+    return [([control] + lines[:j], lines[j]) for j in reversed(range(len(lines)))]
 
-    # set qclause to first literal
-    qclause = _lit_to_qbool(next(lit_iterator), qbools)
 
-    # add OR of other literals
-    for lit in lit_iterator:
-        qclause = qclause | _lit_to_qbool(lit, qbools)
+def _count_at_least(inputs, k, target, counter, wires):
+    """
+    Flips wire `target` iff at least `k` of the literals `inputs` are True.
+    The inputs are added up in the binary `counter` register (which starts
+    and ends in state |0>), one controlled increment per input.
+    """
+    bits = max(1, (len(inputs)).bit_length())
+    register = counter[:bits]
+    lines = [len(wires) + 1 + i for i in range(bits)]
+    all_wires = list(wires) + list(register)
+
+    increments = []
+    for lit in inputs:
+        increments += _increment(lit, lines)
+    for controls, line in increments:
+        _mcx(controls, all_wires[line - 1], all_wires)
 
-    return qclause
+    # mark the counts >= k, or the counts < k and flip, whichever is fewer
+    values = range(k, len(inputs) + 1)
+    if len(values) > k:
+        values = range(k)
+        X(target)
+    for value in values:
+        _mcx([line if (value >> j) & 1 else -line
+              for j, line in enumerate(lines)], target, all_wires)
 
+    for controls, line in reversed(increments):
+        _mcx(controls, all_wires[line - 1], all_wires)
 
-def _cnf_to_qbool_expression(n, clauses, qbools):
+
+def oracle_from_circuit(num_inputs, gates, outputs):
     """
-    Returns a MyQLM QBool expression (QClause) of this CNF formula.
+    Constructs a phase oracle from a Boolean circuit over `num_inputs` input
+    wires, which flips the phase iff all `outputs` are True. Only the inputs
+    are wires of the routine: every gate output is computed into an ancilla,
+    and uncomputed after the phase flip. See circuit_routine() for the
+    arguments.
     """
-    if len(qbools) < n:
-        raise ValueError(f"Too few QBools ('{len(qbools)}') for CNF vars '{n}'")
+    return _circuit_routine(num_inputs, gates, outputs, phase=True)
 
-    clause_iterator = iter(clauses)
 
-    # set expr to first clause
-    expr = _clause_to_qbool_clause(next(clause_iterator), qbools)
+def circuit_routine(num_inputs, gates, outputs):
+    """
+    Constructs a routine on num_inputs + 1 wires, which flips the last wire
+    iff all `outputs` of a Boolean circuit over the first `num_inputs` wires
+    are True. Gate outputs are computed into ancillas, and uncomputed.
 
-    # add AND of other clauses
-    for clause in clause_iterator:
-        expr = expr & _clause_to_qbool_clause(clause, qbools)
+    Lines of the circuit are numbered like CNF variables: lines 1 to
+    `num_inputs` are the inputs, line num_inputs + i + 1 is the output of
+    gates[i].
 
-    return expr
+    Args:
+        num_inputs: The number of input wires.
+        gates: List of (gate type, input literals, k), with the gate type in
+          ['and', 'or', 'not', 'atleast', 'atmost'] and `k` the threshold of
+          'atleast' and 'atmost' gates.
+        outputs: The literals which have to be True.
+    """
+    return _circuit_routine(num_inputs, gates, outputs, phase=False)
 
 
-def oracle_from_cnf(n, clauses):
+def _circuit_routine(num_inputs, gates, outputs, phase):
     """
-    Constructs a phase oracle from the given CNF formula.
+    Builds the routine of oracle_from_circuit() (if `phase` is True) or of
+    circuit_routine().
     """
     routine = QRoutine()
-    qbools = routine.new_wires(n, QBoolArray)
+    inputs = routine.new_wires(num_inputs)
+    result = None if phase else routine.new_wires(1)
+    ancillas = routine.new_wires(len(gates))
+    counter_size = max([len(lits).bit_length() for gate_type, lits, _ in gates
+                        if gate_type in ('atleast', 'atmost')], default=0)
+    counter = routine.new_wires(counter_size)
+    routine.set_ancillae(ancillas)
+    if counter_size > 0:
+        routine.set_ancillae(counter)
+    wires = list(inputs) + list(ancillas)
+
+    with routine.compute():
+        for i, (gate_type, lits, k) in enumerate(gates):
+            target = ancillas[i]
+            if gate_type == 'and':
+                _mcx(lits, target, wires)
+            elif gate_type == 'or':
+                _mcx([-lit for lit in lits], target, wires)
+                X(target)
+            elif gate_type == 'not':
+                _mcx([-lits[0]], target, wires)
+            elif gate_type in ('atleast', 'atmost'):
+                threshold = k if gate_type == 'atleast' else k + 1
+                if threshold > 0:
+                    _count_at_least(lits, threshold, target, counter, wires)
+                else:
+                    X(target)
+                if gate_type == 'atmost':
+                    X(target)
+            else:
+                raise ValueError(f"Gate type '{gate_type}' not supported")
 
-    expr = _cnf_to_qbool_expression(n, clauses, qbools)
-    expr.phase()
+    # phase flip, or flip of the result wire, iff all outputs are True
+    if not phase:
+        _mcx(outputs, result[0], wires)
+    elif len(outputs) > 0:
+        negated = [wires[-lit - 1] for lit in outputs if lit < 0]
+        for wire in negated:
+            X(wire)
+        Z.ctrl(len(outputs) - 1)(*(wires[abs(lit) - 1] for lit in outputs))
+        for wire in negated:
+            X(wire)
 
+    routine.uncompute()
     return routine
 
 
@@ -100,12 +320,233 @@ def diffusion(n):
     return routine
 
 
-def grover_var_map(n):
+# the number of circuits (besides the one without iterations) kept by every
+# GroverCircuits
+CIRCUITS_PER_ORACLE = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_diffusion(n):
+    """
+    The diffusion operator for n variables, built once per n.
+    """
+    return diffusion(n)
+
+
+class GroverCircuits:
+    """
+    The compiled circuits of Grover's algorithm for a single oracle. One
+    iteration (the oracle followed by the diffusion operator) is compiled
+    only once, and the circuit with r iterations is built by appending it to
+    the longest circuit built so far with fewer iterations. Only the
+    CIRCUITS_PER_ORACLE most recently used circuits are kept (and the one
+    without iterations), so memory grows linearly in r, not quadratically.
+    """
+
+    def __init__(self, n, iteration):
+        """
+        Args:
+            n: The number of variables (search qubits), which are the first
+              qubits of `iteration`.
+            iteration: The compiled circuit of one Grover iteration.
+        """
+        self.n = n
+        self.iteration = iteration
+
+        # the initial superposition, on the qubits of the iteration (which
+        # includes the ancillas of the oracle)
+        prefix = Program()
+        qubits = prefix.qalloc(iteration.nbqbits)
+        for wire in qubits[:n]:
+            H(wire)
+        # map: r -> circuit with r iterations, least recently used first
+        self.circuits = OrderedDict([(0, prefix.to_circ())])
+
+
+    def circuit(self, r):
+        """
+        Returns the circuit with r Grover iterations.
+        """
+        if r not in self.circuits:
+            start = max(k for k in self.circuits if k < r)
+            circuit = self.circuits[start]
+            for _ in range(r - start):
+                circuit = circuit + self.iteration
+            self.circuits[r] = circuit
+            while len(self.circuits) > CIRCUITS_PER_ORACLE + 1:
+                oldest = next(k for k in self.circuits if k != 0)
+                del self.circuits[oldest]
+        self.circuits.move_to_end(r)
+        return self.circuits[r]
+
+
+class IncrementalOracle:
+    """
+    Grover iterations for a fixed base formula together with a growing list
+    of blocking clauses, each of which blocks the assignments in which a set
+    of variables is True (see CNF.block_positive_only()).
+
+    The base formula is computed into an output qubit by a routine which is
+    compiled only once. Every blocking clause is a small term, which adds 1
+    to a binary counter register iff the clause is violated, using a single
+    temporary qubit. The oracle flips the phase iff the base formula is True
+    and the counter is 0, and then undoes the terms and the base formula.
+    All parts are compiled separately and put together by concatenating the
+    compiled circuits, so adding a blocking clause only compiles the gates
+    of that clause. Only when the counter needs another bit (after 1, 3, 7,
+    ... clauses) are the parts compiled again.
+    """
+
+    def __init__(self, n, base):
+        """
+        Args:
+            n: The number of variables (search qubits).
+            base: A QRoutine on n + 1 wires, which flips the last wire iff
+              the first n wires satisfy the base formula (see cnf_routine()
+              and circuit_routine()).
+        """
+        self.n = n
+        self.base = base
+        self.width = None # number of counter bits of the compiled parts
+        self.num_qubits = None
+        self.parts = {} # name -> compiled circuit
+        self.terms = {} # blocked variables -> (term, inverse term)
+        self.blocks = () # the blocks in `compute` and `uncompute`
+        self.compute = None # base followed by the terms of `blocks`
+        self.uncompute = None # the inverse of `compute`
+        self.last = None # (blocks, GroverCircuits) of the last call
+
+
+    def _program(self):
+        """
+        Returns a new program and its qubits: the n search qubits, the output
+        of the base formula, the temporary qubit, the counter, and the
+        ancillas of the base routine.
+        """
+        program = Program()
+        return program, program.qalloc(self.num_qubits)
+
+
+    def _compile_parts(self, width):
+        """
+        Compiles the base formula, phase flip and diffusion operator for a
+        counter with `width` bits.
+        """
+        n = self.n
+        self.width = width
+        program = Program()
+        qubits = program.qalloc(n + 2 + width)
+        self.base(qubits[:n + 1])
+        base = program.to_circ()
+        self.num_qubits = base.nbqbits
+        self.parts = {'base': base, 'base_dag': base.dag()}
+
+        # phase flip iff the base formula is True and the counter is 0
+        program, qubits = self._program()
+        counter = qubits[n + 2:n + 2 + width]
+        for wire in counter:
+            X(wire)
+        if width > 0:
+            Z.ctrl(width)(*counter, qubits[n])
+        else:
+            Z(qubits[n])
+        for wire in counter:
+            X(wire)
+        self.parts['phase'] = program.to_circ()
+
+        program, qubits = self._program()
+        _cached_diffusion(n)(qubits[:n])
+        self.parts['diffusion'] = program.to_circ()
+
+        self.terms = {}
+        self.blocks = ()
+        self.compute = self.parts['base']
+        self.uncompute = self.parts['base_dag']
+
+
+    def _term(self, block):
+        """
+        Returns the compiled term of a blocking clause and its inverse.
+        """
+        if block not in self.terms:
+            n = self.n
+            program, qubits = self._program()
+            temp = n + 2 # line of the temporary qubit
+            counter = list(range(n + 3, n + 3 + self.width))
+            _mcx(list(block), qubits[temp - 1], qubits)
+            for controls, line in _increment(temp, counter):
+                _mcx(controls, qubits[line - 1], qubits)
+            _mcx(list(block), qubits[temp - 1], qubits)
+            term = program.to_circ()
+            self.terms[block] = (term, term.dag())
+        return self.terms[block]
+
+
+    def circuits(self, blocks):
+        """
+        Returns the GroverCircuits of the base formula with the given
+        blocking clauses, each given by the variables it blocks.
+        """
+        blocks = tuple(tuple(sorted(block)) for block in blocks)
+        if self.last is not None and self.last[0] == blocks:
+            return self.last[1]
+
+        width = len(blocks).bit_length()
+        if self.width is None or width > self.width:
+            self._compile_parts(width)
+        if blocks[:len(self.blocks)] != self.blocks:
+            self.blocks = ()
+            self.compute = self.parts['base']
+            self.uncompute = self.parts['base_dag']
+        for block in blocks[len(self.blocks):]:
+            term, inverse = self._term(block)
+            self.compute = self.compute + term
+            self.uncompute = inverse + self.uncompute
+        self.blocks = blocks
+
+        iteration = self.compute + self.parts['phase'] + self.uncompute + \
+            self.parts['diffusion']
+        self.last = (blocks, GroverCircuits(self.n, iteration))
+        return self.last[1]
+
+
+# map: (n, oracle key) -> IncrementalOracle, least recently used first
+_GROVER_CACHE = OrderedDict()
+GROVER_CACHE_SIZE = 16
+
+
+def _cached(cache_key, build):
+    """
+    Gets `cache_key` from the cache, or adds the result of build() for it.
+    """
+    if cache_key in _GROVER_CACHE:
+        _GROVER_CACHE.move_to_end(cache_key)
+        return _GROVER_CACHE[cache_key]
+    value = build()
+    _GROVER_CACHE[cache_key] = value
+    while len(_GROVER_CACHE) > GROVER_CACHE_SIZE:
+        _GROVER_CACHE.popitem(last=False)
+    return value
+
+
+def get_incremental_oracle(n, key, build_base):
+    """
+    Returns the IncrementalOracle for the base formula identified by `key`
+    from a cache of the most recently used oracles, so oracles are only built
+    and compiled again when the formula changes.
+
+    Args:
+        n: The number of variables (search qubits).
+        key: A hashable description of the base formula.
+        build_base: Function returning the routine computing the base
+          formula, only called if it is not in the cache.
+    """
+    return _cached(('incremental', n, key),
+                   lambda: IncrementalOracle(n, build_base()))
+
+
+def clear_grover_cache():
     """
-    Creates a map: var_num -> qubit_num.
-    (Needed when parsing the measurement results.)
+    Removes all oracles from the cache of get_incremental_oracle().
     """
-    res = {}
-    for i in range(n):
-        res[i+1] = i
-    return res
+    _GROVER_CACHE.clear()
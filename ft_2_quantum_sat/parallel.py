@@ -0,0 +1,175 @@
+"""
+Parallel enumeration of minimal cut sets. The search space is split into
+disjoint sub-problems (cubes) by fixing a few basic events with many parents
+to True or False, and the cubes are solved by a pool of worker processes.
+"""
+import math
+import multiprocessing
+
+from ft_2_quantum_sat.solver_session import SATSession
+
+
+def _agrees(cube, cutset):
+    """
+    Returns whether the cut set may be blocked in the given cube, i.e. whether
+    its cube variables are all True in the cube.
+    """
+    positive = {lit for lit in cube if lit > 0}
+    cube_vars = {abs(lit) for lit in cube}
+    return positive.issuperset(cube_vars.intersection(cutset))
+
+
+def _solve_cube(session, cube, k, input_vars):
+    """
+    Finds all cut sets of size `k` inside the given cube.
+
+    Args:
+        session: The SATSession of the cube, with the cut sets of all smaller
+          orders blocked.
+        cube: List of literals fixing the cube variables.
+        k: The cut set order.
+        input_vars: The variables of the basic events.
+
+    Returns:
+        A tuple (found, done), with the cut sets found as lists of positive
+        variables, and whether the cube has no larger cut sets left.
+    """
+    found = []
+    assumptions = list(cube) + session.cardinality_bound(k, input_vars)
+    while True:
+        sat, model = session.solve(assumptions=assumptions)
+        if not sat:
+            break
+        cutset = [var for var in input_vars if model[var - 1] > 0]
+        session.block_positive_only(cutset)
+        found.append(cutset)
+    done, _ = session.solve(assumptions=cube)
+    return found, not done
+
+
+def _worker(conn, formula, input_vars, cubes):
+    """
+    Main loop of a worker process, which solves the same cubes for every cut
+    set order. Every cube keeps its SATSession between the orders, so only
+    the cut sets found by the last order have to be sent and blocked.
+
+    Receives tuples (k, new_cutsets) from `conn` and answers each with a list
+    of (found, done) tuples (see _solve_cube()) for the cubes which were not
+    done before, or with the exception raised.
+    """
+    sessions = [SATSession(formula) for _ in cubes]
+    own = [set() for _ in cubes] # cut sets found in each cube by the last order
+    while True:
+        k, new_cutsets = conn.recv()
+        try:
+            results = []
+            for i, cube in enumerate(cubes):
+                if sessions[i] is None:
+                    continue
+                for cutset in new_cutsets:
+                    if tuple(cutset) not in own[i] and _agrees(cube, cutset):
+                        sessions[i].block_positive_only(cutset)
+                if len([lit for lit in cube if lit > 0]) > k:
+                    results.append(([], False)) # no cut set of size <= k
+                    continue
+                found, done = _solve_cube(sessions[i], cube, k, input_vars)
+                own[i] = {tuple(cutset) for cutset in found}
+                if done:
+                    sessions[i].delete()
+                    sessions[i] = None
+                results.append((found, done))
+            conn.send(results)
+        except Exception as error: # pylint: disable=broad-except
+            conn.send(error)
+
+
+def _choose_cube_vars(ft, all_vars, input_vars, processes):
+    """
+    Picks the basic events to split on: the events with the most parents, and
+    enough of them to give every process about two cubes.
+
+    Returns:
+        A list of variables.
+    """
+    num = min(len(input_vars), math.ceil(math.log2(2 * max(processes, 1))))
+    names = {var: name for name, var in all_vars.items()}
+    ranked = sorted(input_vars, key=lambda var: -ft.graph.in_degree(names[var]))
+    return ranked[:num]
+
+
+def compute_min_cutsets_parallel(ft, m, processes=None, top_event=None,
+                                 encoding='tseitin'):
+    """
+    Computes the `m` smallest cut sets of a fault tree with a pool of worker
+    processes. For every cut set order k, all cubes are solved in parallel,
+    each with the cut sets of all smaller orders blocked. Cut sets of the same
+    order found in different cubes are different, and none of them contains a
+    cut set of a smaller order, so the merged cut sets are minimal.
+
+    Args:
+        ft: The FaultTree.
+        m: The number of cutsets to compute.
+        processes: (Optional) The number of worker processes, by default the
+          number of CPUs.
+        top_event: (Optional) Compute the cut sets of this node instead of
+          `ft.top_event`.
+        encoding: (Optional) See FaultTree.to_cnf().
+
+    Returns:
+        The cut sets as a list of sets of basic event names, in order of
+        non-decreasing size.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    f, all_vars, input_vars = ft.to_cnf(top_event=top_event, encoding=encoding)
+    input_vars = list(input_vars)
+
+    # the empty cut set (the top event is always True) is the only one
+    with SATSession(f) as session:
+        empty, _ = session.solve(assumptions=[-var for var in input_vars])
+    if empty:
+        return [set()][:m]
+
+    cube_vars = _choose_cube_vars(ft, all_vars, input_vars, processes)
+
+    cubes = []
+    for i in range(2**len(cube_vars)):
+        cubes.append([var if (i >> j) & 1 else -var
+                      for j, var in enumerate(cube_vars)])
+
+    # every worker keeps the same cubes for all orders
+    processes = max(1, min(processes, len(cubes)))
+    conns, workers = [], []
+    for i in range(processes):
+        conn, worker_conn = multiprocessing.Pipe()
+        worker = multiprocessing.Process(
+            target=_worker, args=(worker_conn, f, input_vars,
+                                  cubes[i::processes]), daemon=True)
+        worker.start()
+        conns.append(conn)
+        workers.append(worker)
+
+    cutsets = []
+    new_cutsets = []
+    num_cubes = len(cubes)
+    try:
+        for k in range(1, len(input_vars) + 1):
+            if len(cutsets) >= m or num_cubes == 0:
+                break
+            for conn in conns:
+                conn.send((k, new_cutsets))
+            new_cutsets = []
+            for conn in conns:
+                results = conn.recv()
+                if isinstance(results, Exception):
+                    raise results
+                for found, done in results:
+                    new_cutsets += found
+                    num_cubes -= done
+            cutsets += new_cutsets
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+
+    return [{f.var_names[var] for var in c} for c in cutsets[:m]]
@@ -0,0 +1,250 @@
+"""
+Structural preprocessing passes over a FaultTree, which make the fault tree
+smaller before it is encoded as a CNF formula. Every pass returns a new
+FaultTree and leaves the given one untouched. Basic events are never renamed,
+so the cut sets of the new fault tree are the same as those of the original.
+"""
+import networkx as nx
+
+
+def _resolve(aliases, node):
+    """
+    Follows the chain of aliases starting at `node`.
+    """
+    while node in aliases:
+        node = aliases[node]
+    return node
+
+
+def gates_bottom_up(ft, cone):
+    """
+    Returns the gates and house events among the nodes `cone` (see
+    FaultTree.cone_of_influence()) in topological order from the bottom up,
+    so every node comes after all of its inputs.
+    """
+    order = list(nx.topological_sort(ft.graph.subgraph(cone)))
+    return [node for node in reversed(order) if ft.node_types[node] != 'input']
+
+
+def _simplify_gate(gate_type, inputs, k, constants):
+    """
+    Simplifies a single gate, given its (already simplified) inputs.
+
+    Returns:
+        Either ('const', value), ('alias', node), or ('gate', (type, inputs, k)).
+    """
+    values = [constants[i] for i in inputs if i in constants]
+    inputs = [i for i in inputs if i not in constants]
+    if gate_type in ('and', 'or'):
+        inputs = list(dict.fromkeys(inputs))
+
+    if gate_type == 'not':
+        if len(values) > 0:
+            return 'const', not values[0]
+        return 'gate', ('not', inputs, None)
+
+    if gate_type == 'and':
+        if False in values:
+            return 'const', False
+        k = len(inputs)
+    elif gate_type == 'or':
+        if True in values:
+            return 'const', True
+        k = 1
+    elif gate_type == 'atleast':
+        k = k - values.count(True)
+    else:
+        raise ValueError(f"Gate type '{gate_type}' currently not supported")
+
+    # every gate is now 'at least k of inputs'
+    if k <= 0:
+        return 'const', True
+    if k > len(inputs):
+        return 'const', False
+    if len(inputs) == 1:
+        return 'alias', inputs[0]
+    if k == 1:
+        return 'gate', ('or', inputs, None)
+    if k == len(inputs):
+        return 'gate', ('and', inputs, None)
+    return 'gate', ('atleast', inputs, k)
+
+
+def _keep_repeated_inputs(originals, inputs, aliases, gates):
+    """
+    Two inputs of an 'atleast' gate can resolve to the same node, but every
+    input counts towards k, and a gate can't have the same input twice. Such
+    repeated inputs are kept as a single input OR gate of the node instead of
+    being resolved.
+
+    Args:
+        originals: The inputs of the gate.
+        inputs: The resolved inputs, in the same order.
+        aliases: The aliases found so far, updated in place.
+        gates: The gates found so far, updated in place.
+
+    Returns:
+        The inputs of the gate, without repetitions.
+    """
+    seen = set()
+    kept = []
+    # inputs which resolve to themselves first, they can't be kept as a gate
+    for original, node in sorted(zip(originals, inputs),
+                                 key=lambda pair: pair[0] != pair[1]):
+        if node in seen:
+            del aliases[original]
+            gates[original] = ('or', [node], None)
+            kept.append(original)
+        else:
+            seen.add(node)
+            kept.append(node)
+    return kept
+
+
+def simplify(ft):
+    """
+    Returns a simplified copy of the given fault tree, in which
+
+      - house events are replaced by their constant values, which are then
+        propagated through the gates,
+      - gates with a single input are removed (their parents use the input
+        instead),
+      - AND (OR) gates which are the only parent of an AND (OR) gate absorb the
+        inputs of that gate,
+      - nodes which the top event doesn't depend on are dropped.
+
+    Removed gates which are equivalent to a node of the new fault tree are
+    recorded in `aliases` (gate name -> node name), removed gates with a
+    constant value in `constants` (gate name -> bool), so the original names
+    can still be used as top event in FaultTree.to_cnf().
+    """
+    order = gates_bottom_up(ft, ft.cone_of_influence())
+
+    # 1. bottom-up: propagate constants and remove single input gates
+    constants = {} # node -> bool
+    aliases = {}   # node -> equivalent node
+    gates = {}     # node -> (type, inputs, k)
+    for node in order:
+        node_type = ft.node_types[node]
+        if node_type == 'house':
+            constants[node] = ft.house_events[node]
+            continue
+        originals = list(ft.get_gate_inputs(node))
+        inputs = [_resolve(aliases, i) for i in originals]
+        if node_type == 'atleast':
+            inputs = _keep_repeated_inputs(originals, inputs, aliases, gates)
+        kind, res = _simplify_gate(node_type, inputs, ft.thresholds.get(node),
+                                   constants)
+        if kind == 'const':
+            constants[node] = res
+        elif kind == 'alias':
+            aliases[node] = res
+        else:
+            gates[node] = res
+
+    # 2. bottom-up: merge AND (OR) gates into their only AND (OR) parent
+    top = _resolve(aliases, ft.top_event)
+    num_parents = {top: 1}
+    for _, inputs, _ in gates.values():
+        for i in inputs:
+            num_parents[i] = num_parents.get(i, 0) + 1
+    for node in order:
+        if node not in gates:
+            continue
+        gate_type, inputs, k = gates[node]
+        if gate_type not in ('and', 'or'):
+            continue
+        merged = []
+        for i in inputs:
+            if i in gates and gates[i][0] == gate_type and num_parents[i] == 1:
+                merged += gates[i][1]
+            else:
+                merged.append(i)
+        gates[node] = (gate_type, list(dict.fromkeys(merged)), k)
+
+    # 3. build the new fault tree from the nodes reachable from the top event
+    return _rebuild(ft, top, gates, aliases, constants)
+
+
+def merge_identical_gates(ft):
+    """
+    Returns a copy of the given fault tree in which structurally identical
+    gates (same type, same k, and the same inputs after merging) are merged
+    into a single node (structural hashing). Gates are processed bottom-up,
+    so identical sub-trees of any depth end up as one shared sub-tree.
+
+    Merged gates are recorded in `aliases` (gate name -> name of the gate it
+    was merged with).
+    """
+    order = gates_bottom_up(ft, ft.cone_of_influence())
+
+    constants = {} # (house events are kept as they are)
+    aliases = {}   # node -> equivalent node
+    gates = {}     # node -> (type, inputs, k)
+    unique = {}    # (type, inputs, k) -> node
+    for node in order:
+        node_type = ft.node_types[node]
+        if node_type == 'house':
+            constants[node] = ft.house_events[node]
+            continue
+        originals = list(ft.get_gate_inputs(node))
+        inputs = [_resolve(aliases, i) for i in originals]
+        k = ft.thresholds.get(node)
+        if node_type == 'atleast':
+            # every input counts towards k, also repeated ones
+            key = (node_type, tuple(sorted(inputs)), k)
+        else:
+            key = (node_type, frozenset(inputs), k)
+        if key in unique:
+            aliases[node] = unique[key]
+            continue
+        unique[key] = node
+        if node_type == 'atleast':
+            inputs = _keep_repeated_inputs(originals, inputs, aliases, gates)
+        gates[node] = (node_type, list(dict.fromkeys(inputs)), k)
+
+    top = _resolve(aliases, ft.top_event)
+    return _rebuild(ft, top, gates, aliases, constants)
+
+
+def _rebuild(ft, top, gates, aliases, constants):
+    """
+    Builds the new fault tree with the given top event and gates, keeping the
+    nodes of `ft` which are reachable from the top event. Nodes in `constants`
+    which are still reachable become house events.
+    """
+    new_ft = type(ft)()
+    reachable = {top}
+    stack = [top]
+    while len(stack) > 0:
+        node = stack.pop()
+        for i in gates[node][1] if node in gates else []:
+            if i not in reachable:
+                reachable.add(i)
+                stack.append(i)
+    for node in ft.graph.nodes:
+        if node not in reachable or node in gates:
+            continue
+        if ft.node_types[node] == 'input':
+            new_ft.add_basic_event(node, ft.probs[node])
+        elif node in constants:
+            new_ft.add_house_event(node, constants[node])
+    for node in ft.graph.nodes:
+        if node in reachable and node in gates:
+            gate_type, inputs, k = gates[node]
+            new_ft.add_gate(node, gate_type, inputs, k)
+    new_ft.set_top_event(top)
+    new_ft.expressions = {n: e for n, e in ft.expressions.items()
+                          if n in new_ft.basic_events}
+    new_ft.parameters = dict(ft.parameters)
+    new_ft.mission_time = ft.mission_time
+
+    # removed nodes (including the aliases and constants of ft itself)
+    for node, target in ft.aliases.items():
+        aliases.setdefault(node, target)
+    new_ft.aliases = {n: _resolve(aliases, n) for n in aliases
+                      if _resolve(aliases, n) in reachable}
+    new_ft.constants = dict(ft.constants)
+    new_ft.constants.update({n: v for n, v in constants.items()
+                             if ft.node_types[n] != 'house'})
+    return new_ft
@@ -0,0 +1,258 @@
+"""
+Quantification of the top event probability from the minimal cut sets of a
+fault tree, assuming independent basic events. The cut sets are stored as a
+sparse cut set x event incidence matrix, so all cut sets are quantified at
+once with NumPy operations instead of Python loops over sets.
+"""
+import numpy as np
+
+
+def _reduceat(ufunc, values, starts):
+    """
+    Applies ufunc.reduceat() along the first axis of `values`. Arrays with
+    samples (shape (nnz, N)) are reduced in transposed, contiguous form,
+    which is several times faster than reducing along axis 0 directly.
+    """
+    if values.ndim == 1:
+        return ufunc.reduceat(values, starts)
+    return ufunc.reduceat(np.ascontiguousarray(values.T), starts, axis=1).T
+
+
+class CutSetMatrix:
+    """
+    Incidence matrix of a list of cut sets, with a row per cut set and a
+    column per basic event, in compressed sparse row form: the events of cut
+    set i are `events[indices[indptr[i]:indptr[i+1]]]`.
+    """
+
+    def __init__(self, cutsets, events=None):
+        """
+        Args:
+            cutsets: The cut sets as a list of sets of event names (e.g. from
+              FaultTree.compute_min_cutsets()).
+            events: (Optional) The event names in column order, by default the
+              sorted events which occur in the cut sets.
+        """
+        if events is None:
+            events = sorted(set().union(*cutsets))
+        self.events = list(events)
+        self.index = {event: i for i, event in enumerate(self.events)}
+        self.sizes = np.fromiter((len(c) for c in cutsets), dtype=np.int64,
+                                 count=len(cutsets))
+        self.indptr = np.zeros(len(cutsets) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.indptr[1:])
+        self.indices = np.fromiter((self.index[e] for c in cutsets for e in c),
+                                   dtype=np.int64, count=self.indptr[-1])
+
+
+    @property
+    def num_cutsets(self):
+        """
+        The number of cut sets (rows).
+        """
+        return len(self.sizes)
+
+
+    @property
+    def num_events(self):
+        """
+        The number of basic events (columns).
+        """
+        return len(self.events)
+
+
+    def event_probabilities(self, probs):
+        """
+        Returns the probabilities of the events of this matrix as an array of
+        shape (E,), or (E, N) if the probabilities are given as N samples.
+
+        Args:
+            probs: Dictionary from event name to probability (a float or an
+              array of N samples), e.g. FaultTree.probs.
+        """
+        missing = [e for e in self.events if probs.get(e) is None]
+        if len(missing) > 0:
+            raise ValueError(f"Events {missing} have no probability")
+        values = [np.asarray(probs[e], dtype=np.float64) for e in self.events]
+        shape = np.broadcast_shapes(*(v.shape for v in values))
+        return np.array([np.broadcast_to(v, shape) for v in values])
+
+
+    def cutset_probabilities(self, event_probs):
+        """
+        Returns the probability of every cut set, the product of the
+        probabilities of its events.
+
+        Args:
+            event_probs: Array of shape (E,) or (E, N), see
+              event_probabilities().
+
+        Returns:
+            An array of shape (C,) or (C, N).
+        """
+        event_probs = np.asarray(event_probs, dtype=np.float64)
+        result = np.ones((self.num_cutsets,) + event_probs.shape[1:])
+
+        # multiply the rows of the events of each (non-empty) cut set, empty
+        # cut sets are always true and keep probability 1
+        non_empty = self.sizes > 0
+        if np.any(non_empty):
+            result[non_empty] = _reduceat(np.multiply,
+                                          event_probs[self.indices],
+                                          self.indptr[:-1][non_empty])
+        return result
+
+
+    def column_sums(self, values):
+        """
+        Sums values given per non-zero entry of the matrix (i.e. aligned with
+        `indices`) over every column.
+
+        Args:
+            values: Array of shape (nnz,) or (nnz, N).
+
+        Returns:
+            An array of shape (E,) or (E, N).
+        """
+        if values.ndim == 1:
+            return np.bincount(self.indices, weights=values,
+                               minlength=self.num_events)
+
+        # with samples, sum the entries sorted by column with reduceat
+        order = np.argsort(self.indices, kind='stable')
+        counts = np.bincount(self.indices, minlength=self.num_events)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        result = np.zeros((self.num_events,) + values.shape[1:])
+        if len(order) > 0:
+            result[counts > 0] = _reduceat(np.add, values[order],
+                                           starts[counts > 0])
+        return result
+
+
+    def rows(self):
+        """
+        Returns the row (cut set) of every non-zero entry of the matrix.
+        """
+        return np.repeat(np.arange(self.num_cutsets), self.sizes)
+
+
+def rare_event(cutset_probs):
+    """
+    The rare event approximation of the top event probability: the sum of
+    the cut set probabilities.
+    """
+    return np.sum(cutset_probs, axis=0)
+
+
+def min_cut_upper_bound(cutset_probs):
+    """
+    The min-cut upper bound of the top event probability:
+    1 - prod(1 - P(cut set)).
+    """
+    with np.errstate(divide='ignore'):
+        return 0.0 - np.expm1(np.sum(np.log1p(-cutset_probs), axis=0))
+
+
+def quantify(cutsets, probs):
+    """
+    Quantifies the top event from its minimal cut sets.
+
+    Args:
+        cutsets: The cut sets as a list of sets of event names, or a
+          CutSetMatrix.
+        probs: Dictionary from event name to probability, e.g.
+          FaultTree.probs. Probabilities can also be arrays of N samples, in
+          which case every result gets an extra axis of length N.
+
+    Returns:
+        A dictionary with
+          'rare_event': the rare event approximation,
+          'mcub': the min-cut upper bound,
+          'cutset_probabilities': the probability of every cut set,
+          'contributions': the fraction of the rare event approximation due
+            to every cut set.
+    """
+    matrix = cutsets if isinstance(cutsets, CutSetMatrix) \
+        else CutSetMatrix(cutsets)
+    cutset_probs = matrix.cutset_probabilities(
+        matrix.event_probabilities(probs))
+    total = rare_event(cutset_probs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contributions = np.where(total > 0, cutset_probs / total, 0.0)
+    return {
+        'rare_event': total,
+        'mcub': min_cut_upper_bound(cutset_probs),
+        'cutset_probabilities': cutset_probs,
+        'contributions': contributions,
+    }
+
+
+def importance(cutsets, probs, events=None):
+    """
+    Computes the Fussell-Vesely, Birnbaum, risk achievement worth (RAW) and
+    risk reduction worth (RRW) importance of every basic event, based on the
+    rare event approximation Q of the top event probability. All measures
+    are computed in one pass over the non-zero entries of the cut set matrix:
+
+      - FV(i) = sum of P(c) over the cut sets c containing i, divided by Q,
+      - Birnbaum(i) = dQ/dp(i), the sum over the cut sets containing i of the
+        product of the other events of the cut set,
+      - RAW(i) = Q(p(i) = 1) / Q,
+      - RRW(i) = Q / Q(p(i) = 0).
+
+    The products of the other events are computed without dividing by p(i),
+    so events with probability 0 are handled as well.
+
+    Args:
+        cutsets: The cut sets as a list of sets of event names, or a
+          CutSetMatrix.
+        probs: See quantify().
+        events: (Optional) The events to compute the measures for, by default
+          those in the cut sets. Ignored if `cutsets` is a CutSetMatrix.
+
+    Returns:
+        A dictionary with the list of 'events', and for 'fussell_vesely',
+        'birnbaum', 'raw' and 'rrw' an array with the measure of every event
+        (with an extra axis of length N if probabilities are samples).
+    """
+    matrix = cutsets if isinstance(cutsets, CutSetMatrix) \
+        else CutSetMatrix(cutsets, events)
+    event_probs = matrix.event_probabilities(probs)
+    cutset_probs = matrix.cutset_probabilities(event_probs)
+    total = rare_event(cutset_probs)
+
+    # product of the other events of the cut set, for every entry: the
+    # product of the non-zero probabilities of the row, divided by p(i) if
+    # p(i) is not zero, and 0 if any other event of the row has p = 0
+    rows = matrix.rows()
+    entry_probs = event_probs[matrix.indices]
+    is_zero = entry_probs == 0
+    if not np.any(is_zero):
+        others = cutset_probs[rows] / entry_probs
+    else:
+        non_empty = matrix.sizes > 0
+        starts = matrix.indptr[:-1][non_empty]
+        row_zeros = np.zeros(cutset_probs.shape, dtype=np.int64)
+        row_nonzero_prod = np.ones(cutset_probs.shape)
+        row_zeros[non_empty] = _reduceat(np.add, is_zero.astype(np.int64),
+                                         starts)
+        row_nonzero_prod[non_empty] = _reduceat(
+            np.multiply, np.where(is_zero, 1.0, entry_probs), starts)
+        other_zeros = row_zeros[rows] - is_zero
+        with np.errstate(divide='ignore', invalid='ignore'):
+            others = np.where(is_zero, row_nonzero_prod[rows],
+                              row_nonzero_prod[rows] / entry_probs)
+        others = np.where(other_zeros > 0, 0.0, others)
+
+    contained = matrix.column_sums(cutset_probs[rows])
+    birnbaum = matrix.column_sums(others)
+    q_failed = total - contained + birnbaum   # p(i) = 1
+    q_perfect = total - contained             # p(i) = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'events': list(matrix.events),
+            'fussell_vesely': np.where(total > 0, contained / total, 0.0),
+            'birnbaum': birnbaum,
+            'raw': np.where(total > 0, q_failed / total, np.inf),
+            'rrw': np.where(q_perfect > 0, total / q_perfect, np.inf),
+        }
@@ -0,0 +1,416 @@
+"""
+Definition of incremental solver sessions, which keep a single live solver
+around for a sequence of related queries on the same CNF formula (e.g. when
+enumerating minimal cut sets).
+"""
+import threading
+import time
+
+from pysat.solvers import Solver
+from pysat.card import CardEnc, ITotalizer
+from pysat.examples.rc2 import RC2, RC2Stratified
+from pysat.formula import WCNF
+
+
+class SATSession:
+    """
+    Incremental SAT session for a CNF formula. The session owns one live SAT
+    solver which is loaded with the clauses of the formula exactly once.
+    Clauses added through the session (e.g. blocking clauses) are pushed
+    straight into the live solver, so learnt clauses are kept between calls to
+    solve().
+
+    Auxiliary variables created by the session (for cardinality constraints
+    and selectors) are numbered above the variables of the formula, and their
+    clauses only live in the solver, not in the formula itself.
+    """
+
+    def __init__(self, formula, solver='glucose3'):
+        self.formula = formula
+        self.top_id = formula.num_vars
+        self.totalizer = None
+        self.solver = Solver(name=solver,
+                             bootstrap_with=formula.solver_clauses())
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.delete()
+
+
+    def delete(self):
+        """
+        Frees the underlying solver.
+        """
+        if self.solver is not None:
+            self.solver.delete()
+            self.solver = None
+        if self.totalizer is not None:
+            self.totalizer.delete()
+            self.totalizer = None
+
+
+    def get_new_var(self):
+        """
+        Gets a new auxiliary variable, which only exists inside the solver.
+        """
+        self.top_id += 1
+        return self.top_id
+
+
+    def add_clause(self, clause):
+        """
+        Adds the given clause to both the formula and the live solver.
+
+        Args:
+            clause: The clause to be added as an iterable of literals.
+        """
+        self.formula.add_clause(clause)
+        self.solver.add_clause(list(clause))
+
+
+    def block_positive_only(self, a):
+        """
+        For an assignment a, blocks the partial assignment which is the
+        positive literals in a (see CNF.block_positive_only()).
+
+        Args:
+            a: a (partial) assignment given as an iterable of literals.
+        """
+        block = [-lit for lit in a if lit > 0]
+        if len(block) > 0:
+            self.add_clause(block)
+
+
+    def add_cardinality_constraint(self, at_most, variables):
+        """
+        Adds a cardinality constraint over `variables` to the solver which is
+        only active when the returned selector literal is passed as an
+        assumption to solve(). Once the constraint is no longer needed it can
+        be switched off for good with retire().
+
+        Returns:
+            The selector literal of the constraint.
+        """
+        selector = self.get_new_var()
+        card = CardEnc.atmost(variables, bound=at_most, top_id=self.top_id)
+        self.top_id = max(self.top_id, card.nv)
+        for clause in card.clauses:
+            self.solver.add_clause(clause + [-selector])
+        return selector
+
+
+    def retire(self, selector):
+        """
+        Permanently disables the constraint guarded by the given selector.
+        """
+        self.solver.add_clause([-selector])
+
+
+    def cardinality_bound(self, at_most, variables):
+        """
+        Returns the assumptions which enforce that at most `at_most` of the
+        given variables are True. The counter over `variables` is an
+        incremental totalizer which is encoded only once per session: asking
+        for a larger bound only adds the clauses for the extra outputs, and
+        moving between bounds only changes the returned assumptions.
+
+        Args:
+            at_most: The cardinality bound.
+            variables: The variables to count, must be the same on every call.
+
+        Returns:
+            A list of assumption literals to pass to solve().
+        """
+        variables = list(variables)
+        if self.totalizer is None:
+            self.totalizer = ITotalizer(lits=variables, ubound=at_most,
+                                        top_id=self.top_id)
+            for clause in self.totalizer.cnf.clauses:
+                self.solver.add_clause(clause)
+        elif self.totalizer.lits != variables:
+            raise ValueError("Totalizer already encoded over other variables")
+        elif len(self.totalizer.rhs) <= at_most < len(variables):
+            num_old = len(self.totalizer.cnf.clauses)
+            self.totalizer.increase(ubound=at_most, top_id=self.top_id)
+            for clause in self.totalizer.cnf.clauses[num_old:]:
+                self.solver.add_clause(clause)
+        self.top_id = max(self.top_id, self.totalizer.top_id)
+
+        # rhs[k] is True iff more than k of the variables are True
+        if at_most >= len(variables):
+            return []
+        return [-self.totalizer.rhs[at_most]]
+
+
+    def solve(self, assumptions=(), budget=None):
+        """
+        Gets 1 satisfying assignment if it exists, under the given assumptions.
+
+        Args:
+            assumptions: (Optional) Assumption literals for this call.
+            budget: (Optional) A Budget limiting this call.
+
+        Returns:
+            A tuple (sat, model), with sat None if the budget ran out.
+        """
+        if budget is None:
+            sat = self.solver.solve(assumptions=list(assumptions))
+        else:
+            sat = budget.solve(self.solver, assumptions)
+        model = self.solver.get_model() if sat else None
+        return sat, model
+
+
+class MaxSATSession:
+    """
+    Incremental MaxSAT session for a CNF formula, the MaxSAT counterpart of
+    SATSession. The session owns one RC2 solver which is built exactly once,
+    with the clauses of the formula as hard clauses and a soft unit clause
+    for every literal in `weight_map`. Clauses added through the session
+    (e.g. blocking clauses) are added to RC2 as hard clauses, so the cores
+    found by earlier calls are kept between calls to solve().
+
+    This only holds if all weights are equal. RC2 switches off weight
+    stratification after its first call, which makes later calls with many
+    different weights very slow, so for those the session keeps the weighted
+    formula (with the added clauses) and solves it with a new stratified
+    solver on every call.
+    """
+
+    def __init__(self, formula, weight_map, solver='g3'):
+        self.formula = formula
+        self.solver_name = solver
+        self.wcnf = WCNF()
+        for clause in formula.solver_clauses():
+            self.wcnf.append(list(clause))
+        for lit, weight in weight_map.items():
+            self.wcnf.append([lit], weight=weight)
+        self.incremental = len(set(weight_map.values())) <= 1
+        self.rc2 = RC2(self.wcnf, solver=solver) if self.incremental else None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.delete()
+
+
+    def delete(self):
+        """
+        Frees the underlying solver.
+        """
+        if self.rc2 is not None:
+            self.rc2.delete()
+            self.rc2 = None
+
+
+    def add_clause(self, clause):
+        """
+        Adds the given clause as a hard clause to both the formula and the
+        live solver.
+
+        Args:
+            clause: The clause to be added as an iterable of literals.
+        """
+        self.formula.add_clause(clause)
+        if self.incremental:
+            self.rc2.add_clause(list(clause))
+        else:
+            self.wcnf.append(list(clause))
+
+
+    def block_positive_only(self, a):
+        """
+        For an assignment a, blocks the partial assignment which is the
+        positive literals in a (see CNF.block_positive_only()).
+
+        Args:
+            a: a (partial) assignment given as an iterable of literals.
+        """
+        block = [-lit for lit in a if lit > 0]
+        if len(block) > 0:
+            self.add_clause(block)
+
+
+    def solve(self, budget=None):
+        """
+        Gets 1 satisfying assignment if it exists, which maximizes the sum of
+        the weights of the satisfied soft clauses.
+
+        Args:
+            budget: (Optional) A Budget limiting this call.
+
+        Returns:
+            A tuple (sat, model), with sat None if the budget ran out.
+        """
+        if not self.incremental:
+            self.delete()
+            self.rc2 = RC2Stratified(self.wcnf, solver=self.solver_name,
+                                     adapt=True, exhaust=True, minz=True)
+        if budget is not None:
+            return budget.compute(self.rc2)
+        model = self.rc2.compute()
+        return model is not None, model
+
+
+class Budget:
+    """
+    Limits on the work done by the solver calls of a single run (e.g. one
+    call to FaultTree.compute_min_cutsets()). Every limit can be set for the
+    whole run (`seconds`, `conflicts`, `propagations`) and for every single
+    solver call (`call_seconds`, ...), limits which are None are not enforced.
+
+    Conflict and propagation limits use the limited-solve interface of the SAT
+    solvers, time limits interrupt the solver from a timer thread. The RC2
+    MaxSAT solver can only be interrupted, so its calls are only bounded in
+    time, while their conflicts and propagations still count towards the
+    limits of the run.
+
+    After a run, `exhausted` tells whether the budget ran out, and `complete`
+    maps every cut set order k which was started to whether all cut sets of
+    order k were found.
+    """
+
+    def __init__(self, seconds=None, conflicts=None, propagations=None,
+                 call_seconds=None, call_conflicts=None,
+                 call_propagations=None):
+        self.seconds = seconds
+        self.conflicts = conflicts
+        self.propagations = propagations
+        self.call_seconds = call_seconds
+        self.call_conflicts = call_conflicts
+        self.call_propagations = call_propagations
+        self.start_time = None
+        self.conflicts_used = 0
+        self.propagations_used = 0
+        self.exhausted = False
+        self.complete = {} # cut set order -> fully enumerated
+
+
+    def _allowance(self, total, used, per_call):
+        """
+        Returns what is left for the next call of a single resource.
+        """
+        limits = [per_call, None if total is None else total - used]
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if len(limits) > 0 else None
+
+
+    def _next_call(self):
+        """
+        Returns the (seconds, conflicts, propagations) allowed for the next
+        call, or None if the budget has run out.
+        """
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        elapsed = time.monotonic() - self.start_time
+        allowance = (self._allowance(self.seconds, elapsed, self.call_seconds),
+                     self._allowance(self.conflicts, self.conflicts_used,
+                                     self.call_conflicts),
+                     self._allowance(self.propagations, self.propagations_used,
+                                     self.call_propagations))
+        if any(limit is not None and limit <= 0 for limit in allowance):
+            self.exhausted = True
+            return None
+        return allowance
+
+
+    def _count(self, stats_before, stats_after):
+        """
+        Adds the conflicts and propagations of the last call to the totals.
+        """
+        self.conflicts_used += stats_after['conflicts'] - \
+                               stats_before['conflicts']
+        self.propagations_used += stats_after['propagations'] - \
+                                  stats_before['propagations']
+
+
+    def expired(self):
+        """
+        Returns True if the budget of the run has run out.
+        """
+        return self._next_call() is None
+
+
+    def mark_complete(self, first, last):
+        """
+        Records that all cut sets of the orders `first` to `last` were found.
+        """
+        for k in range(first, last + 1):
+            self.complete[k] = True
+
+
+    def solve(self, solver, assumptions=()):
+        """
+        Calls solve_limited() on the given pysat solver within the budget.
+
+        Returns:
+            True or False, or None if the budget ran out.
+        """
+        allowance = self._next_call()
+        if allowance is None:
+            return None
+        seconds, conflicts, propagations = allowance
+        # (a budget of -1 switches off both budgets of the solver)
+        solver.conf_budget(-1)
+        if conflicts is not None:
+            solver.conf_budget(conflicts)
+        if propagations is not None:
+            solver.prop_budget(propagations)
+
+        stats = solver.accum_stats()
+        timer = None
+        if seconds is not None:
+            timer = threading.Timer(seconds, solver.interrupt)
+            timer.start()
+        try:
+            sat = solver.solve_limited(assumptions=list(assumptions),
+                                       expect_interrupt=timer is not None)
+        finally:
+            if timer is not None:
+                timer.cancel()
+                solver.clear_interrupt()
+        self._count(stats, solver.accum_stats())
+
+        if sat is None:
+            self.exhausted = True
+        return sat
+
+
+    def compute(self, rc2):
+        """
+        Calls compute() on the given RC2 MaxSAT solver within the budget.
+
+        Returns:
+            A tuple (status, model), with status True or False, or None if the
+            budget ran out.
+        """
+        allowance = self._next_call()
+        if allowance is None:
+            return None, None
+        seconds = allowance[0]
+
+        stats = rc2.oracle.accum_stats()
+        timer = None
+        if seconds is not None:
+            timer = threading.Timer(seconds, rc2.interrupt)
+            timer.start()
+        try:
+            model = rc2.compute(expect_interrupt=timer is not None)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        self._count(stats, rc2.oracle.accum_stats())
+
+        if rc2.interrupted:
+            rc2.clear_interrupt()
+            if model is None:
+                self.exhausted = True
+                return None, None
+        return model is not None, model
@@ -30,7 +30,7 @@ setup(
     license="European Union Public License 1.2",
 
     packages=find_packages(),
-    install_requires=["matplotlib", "networkx", "pydot",
+    install_requires=["matplotlib", "networkx", "numpy", "pydot",
                       "python-sat", "qiskit"],
     # Don't change these two lines
     tests_require=["pytest"],
@@ -85,3 +85,120 @@ def test_cardinality_constraint():
     f1.add_cardinality_constraint(1)
     sat, _ = f1.solve()
     assert sat is False
+
+
+def test_compact_clause_store():
+    """
+    Testing the array-backed clause storage.
+    """
+    f = CNF(compact=True)
+    f.add_clause([1, 2])
+    f.add_clauses([[-2], [3, 2, -1]])
+    assert f.num_vars == 3
+    assert len(f.clauses) == 3
+    assert list(f.clauses) == [(1, 2), (-2,), (3, 2, -1)]
+    assert f.is_satisfying([1, -2, 3])
+    assert not f.is_satisfying([1, -2, -3])
+    sat, assignment = f.solve()
+    assert sat is True
+    assert assignment == [1, -2, 3]
+
+    # copies share the buffers, but appending to one doesn't affect the other
+    g = f.copy()
+    g.block_positive_only([1, -2, 3])
+    f.add_clause([-3])
+    assert list(g.clauses)[-1] == (-1, -3)
+    assert list(f.clauses)[-1] == (-3,)
+    assert len(f.clauses) == 4
+    assert len(g.clauses) == 4
+    sat, _ = g.solve()
+    assert sat is False
+    sat, _ = f.solve()
+    assert sat is False
+
+    # new variables are still checked
+    failed_to_add = False
+    try:
+        f.add_clause([1, 6])
+    except ValueError:
+        failed_to_add = True
+    assert failed_to_add
+
+
+def test_nary_gates_polarity():
+    """
+    Testing the n-ary (Plaisted-Greenbaum) gate encodings. Every formula
+    starts with the clause (x1 v x2 v x3 v x4) to declare the variables.
+    """
+    # x4 <==> AND(x1, x2, x3), no auxiliary variables
+    f = CNF()
+    f.add_clause([1, 2, 3, 4])
+    f.add_nary_and([1, 2, 3], 4)
+    assert f.num_vars == 4
+    assert len(f.clauses) == 5
+    assert f.is_satisfying([1, 2, 3, 4])
+    assert not f.is_satisfying([1, -2, 3, 4])
+    assert not f.is_satisfying([1, 2, 3, -4])
+
+    # positive polarity: only x4 ==> AND(x1, x2, x3)
+    f = CNF()
+    f.add_clause([1, 2, 3, 4])
+    f.add_nary_and([1, 2, 3], 4, polarity=1)
+    assert len(f.clauses) == 4
+    assert not f.is_satisfying([1, -2, 3, 4])
+    assert f.is_satisfying([1, 2, 3, -4])
+
+    # x4 <==> OR(x1, x2, x3)
+    f = CNF()
+    f.add_clause([1, 2, 3, 4])
+    f.add_nary_or([1, 2, 3], 4)
+    assert len(f.clauses) == 5
+    assert f.is_satisfying([-1, 2, -3, 4])
+    assert not f.is_satisfying([-1, -2, -3, 4])
+    assert not f.is_satisfying([-1, 2, -3, -4])
+
+    # negative polarity: only OR(x1, x2, x3) ==> x4
+    f = CNF()
+    f.add_clause([1, 2, 3, 4])
+    f.add_tseitin_multi('or', [1, 2, 3], 4, polarity=-1)
+    assert len(f.clauses) == 4
+    assert f.is_satisfying([-1, -2, -3, 4])
+    assert not f.is_satisfying([-1, 2, -3, -4])
+
+
+def test_tseitin_atleast():
+    """
+    Testing the totalizer based k-out-of-n gate encoding.
+    """
+    # x6 <==> at least 3 of (x1, ..., x5)
+    f = CNF()
+    for _ in range(6):
+        f.get_new_var()
+    out = f.add_tseitin_atleast([1, 2, 3, 4, 5], 3, 6)
+    assert out == 6
+
+    # check every assignment of the inputs with a SAT call
+    for i in range(2**5):
+        inputs = [var if (i >> (var - 1)) & 1 else -var for var in range(1, 6)]
+        expected = len([lit for lit in inputs if lit > 0]) >= 3
+        f_i = f.copy()
+        for lit in inputs:
+            f_i.add_clause([lit])
+        f_i.add_clause([6 if expected else -6])
+        sat, _ = f_i.solve()
+        assert sat is True
+        f_i.block([6 if expected else -6])
+        sat, _ = f_i.solve()
+        assert sat is False
+
+
+def test_tseitin_not():
+    """
+    Testing the NOT gate through add_tseitin_multi().
+    """
+    f = CNF()
+    f.add_clause([1, 2])
+    f.add_tseitin_multi('not', [1], 2)
+    assert f.is_satisfying([1, -2])
+    assert f.is_satisfying([-1, 2])
+    assert not f.is_satisfying([1, 2])
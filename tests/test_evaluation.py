@@ -0,0 +1,76 @@
+"""
+Tests for the evaluation module.
+"""
+
+import itertools
+import numpy as np
+
+from ft_2_quantum_sat.fault_tree import FaultTree
+from ft_2_quantum_sat.quantification import quantify
+
+
+def test_evaluate():
+    """
+    Test the evaluation of all gate types for all scenarios.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c', 'd']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_house_event('h', True)
+    ft.add_gate('g1', 'and', ['a', 'b'])
+    ft.add_gate('g2', 'atleast', ['b', 'c', 'd'], 2)
+    ft.add_gate('g3', 'not', ['d'])
+    ft.add_gate('g4', 'and', ['c', 'g3', 'h'])
+    ft.add_gate('top', 'or', ['g1', 'g2', 'g4'])
+
+    evaluator = ft.evaluator()
+    assert evaluator.events == ['a', 'b', 'c', 'd']
+    scenarios = np.array(list(itertools.product([False, True], repeat=4))).T
+    values = evaluator.evaluate(scenarios, all_nodes=True)
+    for s, (a, b, c, d) in enumerate(scenarios.T.astype(int)):
+        assert values['g1'][s] == (a and b)
+        assert values['g2'][s] == (b + c + d >= 2)
+        assert values['g4'][s] == (c and not d)
+        assert values['top'][s] == ((a and b) or (b + c + d >= 2)
+                                    or (c and not d))
+    assert list(evaluator.evaluate(scenarios)) == list(values['top'])
+
+
+def test_monte_carlo():
+    """
+    Test the Monte Carlo estimate of the top event probability.
+    """
+    ft = FaultTree()
+    ft.set_top_event('car breaks')
+    ft.add_basic_event('engine breaks', 0.05)
+    ft.add_basic_event('wheel breaks', 0.1)
+    ft.add_basic_event('no spare', 0.3)
+    ft.add_gate('car breaks', 'or', ['engine breaks', 'wheel issue'])
+    ft.add_gate('wheel issue', 'and', ['wheel breaks', 'no spare'])
+
+    exact = 1 - (1 - 0.05) * (1 - 0.1 * 0.3)
+    estimate, stderr = ft.evaluator().monte_carlo(200000, ft.probs,
+                                                  batch_size=30000, seed=1)
+    assert abs(estimate - exact) < 5 * stderr
+    assert abs(quantify(ft.compute_min_cutsets(10, 'classical'),
+                        ft.probs)['mcub'] - exact) < 1e-12
+
+
+def test_check_cutsets():
+    """
+    Test checking cut sets without a solver.
+    """
+    ft = FaultTree.load_from_xml("models/BSCU/BSCU.xml")
+    evaluator = ft.evaluator()
+    for method in ['classical', 'min-sat']:
+        cutsets = ft.compute_min_cutsets(30, method)
+        is_cutset, is_minimal = evaluator.check_cutsets(cutsets)
+        assert is_cutset.all() and is_minimal.all()
+
+    cutset = cutsets[0]
+    other = next(e for e in evaluator.events if e not in cutset)
+    is_cutset, is_minimal = evaluator.check_cutsets(
+        [cutset | {other}, set(list(cutset)[1:])])
+    assert list(is_cutset) == [True, False]
+    assert not is_minimal.any()
@@ -0,0 +1,87 @@
+"""
+Tests for the expressions module.
+"""
+
+import math
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import pytest
+
+from ft_2_quantum_sat import expressions
+from ft_2_quantum_sat.fault_tree import FaultTree
+
+
+def test_evaluate():
+    """
+    Test the point estimate and samples of (nested) expressions.
+    """
+    parameters = {
+        'rate': expressions.parse(ElementTree.fromstring(
+            '<lognormal-deviate><float value="1e-4"/><float value="3"/>'
+            '<float value="0.95"/></lognormal-deviate>')),
+        'half': expressions.parse(ElementTree.fromstring(
+            '<div><float value="1"/><int value="2"/></div>')),
+    }
+    expression = expressions.parse(ElementTree.fromstring(
+        '<exponential><parameter name="rate"/>'
+        '<mul><parameter name="half"/><system-mission-time/></mul>'
+        '</exponential>'))
+    assert math.isclose(expressions.evaluate(expression, parameters, 1000),
+                        1 - math.exp(-1e-4 * 500))
+
+    cache = {}
+    samples = expressions.evaluate(expression, parameters, 1000, 20000,
+                                   np.random.default_rng(0), cache)
+    assert samples.shape == (20000,)
+    # every sample uses the same sample of 'rate'
+    assert np.allclose(samples, -np.expm1(-cache['rate'] * 500))
+    assert abs(np.mean(cache['rate']) - 1e-4) < 3e-6
+    # 95% of the samples lie within a factor 3 of the median
+    median = np.median(cache['rate'])
+    inside = np.mean((cache['rate'] > median / 3) & (cache['rate'] < median * 3))
+    assert abs(inside - 0.95) < 0.01
+
+    with pytest.raises(ValueError):
+        expressions.evaluate(('parameter', 'undefined', ()), parameters)
+
+    # only the 4 argument form of periodic-test is supported
+    constant = ('float', 0.5, ())
+    with pytest.raises(ValueError, match="periodic-test with 5 arguments"):
+        expressions.evaluate(('periodic-test', None, (constant,) * 5), {})
+
+
+def test_parse_expressions():
+    """
+    Test loading models with parameters, mission time and periodic tests.
+    """
+    ft = FaultTree.load_from_files("models/HIPPS")
+    assert math.isclose(ft.probs['PSH1Failure'],
+                        1 - math.exp(-7e-7 * (8760 % 720)))
+    assert math.isclose(ft.probs['LogicSolverFailure'],
+                        1e-6 / (1e-6 + 0.1) * (1 - math.exp(-0.100001 * 8760)))
+    ft.mission_time = 1000
+    ft.update_probabilities()
+    assert math.isclose(ft.probs['PSH1Failure'],
+                        1 - math.exp(-7e-7 * (1000 % 720)))
+
+    ft = FaultTree.load_from_xml("models/SmallTree/SmallTree.xml")
+    assert math.isclose(ft.probs['e1'], 1 - math.exp(-2e-5 * 8760))
+    assert ft.probs['e4'] == ft.probs['e2']
+
+
+def test_uncertainty():
+    """
+    Test the propagation of sampled probabilities to the top event.
+    """
+    ft = FaultTree.load_from_xml("models/SmallTree/SmallTree.xml")
+    cutsets = ft.compute_min_cutsets(10, 'classical')
+    result = ft.uncertainty(cutsets, num_samples=10000, seed=1)
+    assert result['samples'].shape == (10000,)
+    assert result['p5'] < result['p50'] < result['p95']
+    assert abs(result['mean'] - ft.quantify(cutsets)['mcub']) < \
+        0.1 * ft.quantify(cutsets)['mcub']
+
+    # e2 and e4 share parameter 'lambda2', so have the same samples
+    probs = ft.sample_probabilities(100, seed=1)
+    assert np.array_equal(probs['e2'], probs['e4'])
+    assert not np.array_equal(probs['e1'], probs['e3'])
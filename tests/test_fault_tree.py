@@ -2,7 +2,11 @@
 Tests for the fault_tree module.
 """
 
-from ft_2_quantum_sat.fault_tree import FaultTree
+import math
+import pytest
+
+from ft_2_quantum_sat.fault_tree import FaultTree, ModelCache
+from ft_2_quantum_sat.solver_session import Budget
 
 def test_ft_and():
     """
@@ -372,3 +376,547 @@ def test_cutsets_bscu():
         assert len(cutsets) == 2
         assert {'ValidityMonitorFailure'} in cutsets
         assert {'SwitchStuckInIntermediatePosition'} in cutsets
+
+
+def test_cutsets_cardinality_modes():
+    """
+    Both cardinality modes of the classical method should give the same cut
+    sets on the BSCU example.
+    """
+    ft = FaultTree.load_from_xml("models/BSCU/BSCU.xml")
+    totalizer = ft.compute_min_cutsets(m=20, method='classical',
+                                       cardinality='totalizer')
+    selector = ft.compute_min_cutsets(m=20, method='classical',
+                                      cardinality='selector')
+    assert len(totalizer) == 10
+    assert len(selector) == 10
+    for cutset in totalizer:
+        assert cutset in selector
+
+
+def test_parse_xml_streaming(tmp_path):
+    """
+    Test the streaming XML parser on a generated model where the gates come
+    before the basic events, and on the parse statistics.
+    """
+    n = 200
+    lines = ['<?xml version="1.0"?>', '<opsa-mef>',
+             '<define-fault-tree name="chain">']
+    for i in range(n):
+        lines.append(f'<define-gate name="g{i}"><and>'
+                     f'<basic-event name="e{i}"/><gate name="g{i+1}"/>'
+                     '</and></define-gate>')
+    lines.append(f'<define-gate name="g{n}"><or>'
+                 '<basic-event name="a"/><basic-event name="b"/>'
+                 '</or></define-gate>')
+    lines.append('</define-fault-tree>')
+    lines.append('<model-data>')
+    for name in [f'e{i}' for i in range(n)] + ['a', 'b']:
+        lines.append(f'<define-basic-event name="{name}"/>')
+    lines.append('</model-data>')
+    lines.append('</opsa-mef>')
+    filepath = tmp_path / 'chain.xml'
+    filepath.write_text('\n'.join(lines))
+
+    ft = FaultTree.load_from_xml(filepath)
+    assert ft.top_event == 'g0'
+    assert ft.number_of_nodes() == 2*n + 3
+    assert ft.node_types['g0'] == 'and'
+    assert ft.node_types[f'g{n}'] == 'or'
+    assert ft.node_types['a'] == 'input'
+    assert ft.parse_stats['nodes'] == 2*n + 3
+    assert ft.parse_stats['nodes_per_second'] > 0
+
+    # basic events are defined after the gates, cut sets should still be right
+    cutsets = ft.compute_min_cutsets(m=2, method='classical')
+    assert len(cutsets) == 2
+    assert {f'e{i}' for i in range(n)} | {'a'} in cutsets
+    assert {f'e{i}' for i in range(n)} | {'b'} in cutsets
+
+    # a gate defined twice in the same file is not merged
+    lines.insert(3, '<define-gate name="g1"><or><basic-event name="a"/>'
+                    '<basic-event name="b"/></or></define-gate>')
+    filepath.write_text('\n'.join(lines))
+    with pytest.raises(ValueError):
+        FaultTree.load_from_xml(filepath)
+    with pytest.raises(ValueError):
+        FaultTree.load_from_xml('models/ThreeMotor/three_motor.xml')
+
+
+def test_load_from_files():
+    """
+    Test loading fault trees which are split over several files, or which use
+    transfer-in gates.
+    """
+    cache = ModelCache()
+
+    # TransOne uses TransTwo (other file), basic events are in a third file
+    ft = FaultTree.load_from_files("models/TransTest", cache=cache)
+    assert ft.top_event == 'TransOne'
+    assert ft.number_of_nodes() == 5
+    assert ft.basic_events == {'A', 'B', 'C'}
+    assert cache.num_parsed == 3
+    cutsets = ft.compute_min_cutsets(m=5, method='classical')
+    assert cutsets == [{'A', 'B', 'C'}]
+
+    # TransTwo on its own, the (shared) basic event file is not parsed again
+    ft = FaultTree.load_from_files(["models/TransTest/trans_two.xml",
+                                    "models/TransTest/trans_model_data.xml"],
+                                   cache=cache)
+    assert ft.top_event == 'TransTwo'
+    assert cache.num_parsed == 3
+    cutsets = ft.compute_min_cutsets(m=5, method='classical')
+    assert cutsets == [{'A', 'B'}]
+
+    # nested transfer gates within a single file
+    ft = FaultTree.load_from_files("models/ThreeLevels/top.xml", cache=cache)
+    assert ft.top_event == 'Top'
+    for method in ['classical', 'min-sat']:
+        cutsets = ft.compute_min_cutsets(m=5, method=method)
+        assert len(cutsets) == 2
+        assert {'A'} in cutsets
+        assert {'B'} in cutsets
+
+    # undefined events are reported
+    failed_to_load = False
+    try:
+        FaultTree.load_from_files("models/TransTest/trans_one.xml", cache=cache)
+    except ValueError:
+        failed_to_load = True
+    assert failed_to_load
+
+
+def test_load_conflicting_files(tmp_path):
+    """
+    Test that files defining the same gate differently are not merged, while
+    identical definitions are.
+    """
+    tree = """<opsa-mef><define-fault-tree name="{0}">
+      <define-gate name="{0}"><{1}><basic-event name="A"/>
+        <basic-event name="B"/></{1}></define-gate>
+    </define-fault-tree>
+    <model-data><define-basic-event name="A"><float value="0.1"/>
+      </define-basic-event>
+      <define-basic-event name="B"><float value="0.2"/></define-basic-event>
+    </model-data></opsa-mef>"""
+    for name, content in [('one', ('top', 'and')), ('two', ('top', 'and')),
+                          ('three', ('top', 'or'))]:
+        (tmp_path / f'{name}.xml').write_text(tree.format(*content))
+
+    # the same fault tree defined twice is loaded once
+    ft = FaultTree.load_from_files([tmp_path / 'one.xml',
+                                    tmp_path / 'two.xml'], cache=ModelCache())
+    assert ft.top_event == 'top'
+    assert ft.compute_min_cutsets(m=5, method='classical') == [{'A', 'B'}]
+
+    with pytest.raises(ValueError):
+        FaultTree.load_from_files([tmp_path / 'one.xml',
+                                   tmp_path / 'three.xml'], cache=ModelCache())
+    with pytest.raises(ValueError):
+        FaultTree.load_from_files("models/Baobab", cache=ModelCache())
+
+
+def test_cone_of_influence():
+    """
+    Test that only the cone of influence of the (chosen) top event is encoded.
+    """
+    ft = FaultTree.load_from_xml("models/BSCU/BSCU.xml")
+    f, var_mapping, input_vars = ft.to_cnf()
+    assert len(var_mapping) == 15
+    assert len(input_vars) == 8
+
+    # LossOfSystem1 only depends on two basic events
+    assert ft.cone_of_influence('LossOfSystem1') == \
+        {'LossOfSystem1', 'System1ElectronicFailure', 'LossOfSystem1PowerSupply'}
+    f, var_mapping, input_vars = ft.to_cnf(top_event='LossOfSystem1')
+    assert f.num_vars == 3
+    assert len(input_vars) == 2
+    assert 'ValidityMonitorFailure' not in var_mapping
+
+    # the input variables are numbered first
+    assert sorted(input_vars) == [1, 2]
+
+    for method in ['classical', 'min-sat']:
+        cutsets = ft.compute_min_cutsets(m=5, method=method,
+                                         top_event='LossOfSystem1')
+        assert len(cutsets) == 2
+        assert {'System1ElectronicFailure'} in cutsets
+        assert {'LossOfSystem1PowerSupply'} in cutsets
+
+
+def test_plaisted_greenbaum_encoding():
+    """
+    The polarity-aware encoding should give the same cut sets as the full
+    Tseitin encoding, with fewer clauses and variables.
+    """
+    ft = FaultTree.load_from_xml("models/Lift/lift.xml")
+    f_ts, _, _ = ft.to_cnf(encoding='tseitin')
+    f_pg, _, _ = ft.to_cnf(encoding='plaisted-greenbaum')
+    assert f_pg.num_vars == ft.number_of_nodes()
+    assert f_pg.num_vars < f_ts.num_vars
+    assert 2*len(f_pg.clauses) < len(f_ts.clauses)
+    assert all(pol == 1 for pol in ft.polarities().values())
+
+    expected = ft.compute_min_cutsets(m=100, method='classical')
+    for method in ['classical', 'min-sat']:
+        cutsets = ft.compute_min_cutsets(m=100, method=method,
+                                         encoding='plaisted-greenbaum')
+        assert len(cutsets) == len(expected)
+        for cutset in cutsets:
+            assert cutset in expected
+
+
+def test_cutsets_atleast_not_gates():
+    """
+    Testing models with k-out-of-n (atleast) and NOT gates.
+    """
+    # PSHFailure is a 2-out-of-3 gate
+    ft = FaultTree.load_from_xml("models/HIPPS/HIPPS.xml")
+    assert ft.node_types['PSHFailure'] == 'atleast'
+    assert ft.thresholds['PSHFailure'] == 2
+    for encoding in ['tseitin', 'plaisted-greenbaum']:
+        for method in ['classical', 'min-sat']:
+            cutsets = ft.compute_min_cutsets(m=20, method=method,
+                                             encoding=encoding)
+            assert len(cutsets) == 9
+            assert {'PSH1Failure', 'PSH2Failure'} in cutsets
+            assert {'PSH1Failure', 'PSH3Failure'} in cutsets
+            assert {'PSH2Failure', 'PSH3Failure'} in cutsets
+            assert {'LogicSolverFailure'} in cutsets
+
+    # CEA9601 has both atleast and NOT gates
+    ft = FaultTree.load_from_files("models/CEA9601")
+    assert 'not' in ft.node_types.values()
+    expected = ft.compute_min_cutsets(m=10, method='classical')
+    cutsets = ft.compute_min_cutsets(m=10, method='classical',
+                                     encoding='plaisted-greenbaum')
+    assert [len(c) for c in cutsets] == [len(c) for c in expected]
+
+
+def test_simplify():
+    """
+    Test the structural simplification of fault trees.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c', 'd', 'e', 'f']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_house_event('on', True)
+    ft.add_house_event('off', False)
+    ft.add_gate('top', 'or', ['g1', 'g2', 'pass'])
+    ft.add_gate('g1', 'or', ['a', 'g3'])      # nested OR
+    ft.add_gate('g3', 'or', ['b', 'off'])     # OR with constant False
+    ft.add_gate('g2', 'and', ['c', 'd', 'on']) # AND with constant True
+    ft.add_gate('pass', 'and', ['g4'])        # single input gate
+    ft.add_gate('g4', 'and', ['e', 'f', 'g5'])
+    ft.add_gate('g5', 'or', ['on', 'a'])      # constant True
+    ft.add_gate('dangling', 'and', ['a', 'b'])
+
+    simple_ft = ft.simplify()
+    assert simple_ft.top_event == 'top'
+    assert simple_ft.number_of_nodes() == 9
+    assert set(simple_ft.get_gate_inputs('top')) == {'a', 'b', 'g2', 'g4'}
+    assert set(simple_ft.get_gate_inputs('g2')) == {'c', 'd'}
+    assert set(simple_ft.get_gate_inputs('g4')) == {'e', 'f'}
+    assert simple_ft.aliases == {'g3': 'b', 'pass': 'g4'}
+    assert simple_ft.constants == {'g5': True}
+
+    # the cut sets don't change, also not when using the original gate names
+    expected = ft.compute_min_cutsets(m=10, method='classical')
+    cutsets = simple_ft.compute_min_cutsets(m=10, method='classical')
+    assert len(cutsets) == 4
+    for cutset in cutsets:
+        assert cutset in expected
+    cutsets = simple_ft.compute_min_cutsets(m=10, method='classical',
+                                            top_event='pass')
+    assert cutsets == [{'e', 'f'}]
+
+    # inputs of 'atleast' gates which resolve to the same node still count
+    # twice (e.g. transfer-in gates of the same event)
+    ft = FaultTree()
+    ft.set_top_event('v')
+    for event in ['x', 'y']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('p1', 'or', ['x'])
+    ft.add_gate('p2', 'or', ['x'])
+    ft.add_gate('v', 'atleast', ['p1', 'p2', 'y'], k=2)
+    assert ft.simplify().compute_min_cutsets(m=10, method='classical') == \
+        ft.compute_min_cutsets(m=10, method='classical') == [{'x'}]
+    ft = FaultTree()
+    ft.set_top_event('v')
+    for event in ['a', 'b', 'c']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('g', 'or', ['a'])
+    ft.add_gate('v', 'atleast', ['c', 'b', 'g', 'a'], k=4)
+    assert ft.simplify().compute_min_cutsets(m=10, method='classical') == \
+        ft.compute_min_cutsets(m=10, method='classical') == [{'a', 'b', 'c'}]
+
+    # on a model from a file
+    ft = FaultTree.load_from_xml("models/Lift/lift.xml")
+    simple_ft = ft.simplify()
+    assert simple_ft.number_of_nodes() < ft.number_of_nodes()
+    expected = ft.compute_min_cutsets(m=100, method='classical')
+    cutsets = simple_ft.compute_min_cutsets(m=100, method='classical')
+    assert len(cutsets) == len(expected)
+    for cutset in cutsets:
+        assert cutset in expected
+
+
+def test_merge_identical_gates():
+    """
+    Test merging of structurally identical sub-trees.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('top', 'or', ['train1', 'train2'])
+    ft.add_gate('train1', 'and', ['pump1', 'c'])
+    ft.add_gate('train2', 'and', ['c', 'pump2'])
+    ft.add_gate('pump1', 'or', ['a', 'b'])
+    ft.add_gate('pump2', 'or', ['b', 'a'])
+
+    merged_ft = ft.merge_identical_gates()
+    assert merged_ft.number_of_nodes() == 6
+    assert merged_ft.aliases == {'pump1': 'pump2', 'train1': 'train2'} or \
+           merged_ft.aliases == {'pump2': 'pump1', 'train2': 'train1'}
+    f, _, _ = ft.to_cnf()
+    merged_f, _, _ = merged_ft.to_cnf()
+    assert merged_f.num_vars < f.num_vars
+
+    cutsets = merged_ft.compute_min_cutsets(m=10, method='classical')
+    assert len(cutsets) == 2
+    assert {'a', 'c'} in cutsets
+    assert {'b', 'c'} in cutsets
+
+    # merged inputs of 'atleast' gates still count twice, and atleast(a, a, b)
+    # is not merged with atleast(a, b)
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'y']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('top', 'or', ['v1', 'v2'])
+    ft.add_gate('g1', 'and', ['a', 'b'])
+    ft.add_gate('g2', 'and', ['b', 'a'])
+    ft.add_gate('v1', 'atleast', ['g1', 'g2', 'y'], k=2)
+    ft.add_gate('v2', 'atleast', ['g1', 'y'], k=2)
+    expected = ft.compute_min_cutsets(m=10, method='classical')
+    assert expected == [{'a', 'b'}]
+    merged_ft = ft.merge_identical_gates()
+    assert 'v2' not in merged_ft.aliases
+    assert merged_ft.compute_min_cutsets(m=10, method='classical') == expected
+
+    # on a model with repeated sub-trees
+    ft = FaultTree.load_from_files("models/Chinese")
+    merged_ft = ft.merge_identical_gates()
+    assert merged_ft.number_of_nodes() < ft.number_of_nodes()
+    expected = ft.compute_min_cutsets(m=1000, method='classical')
+    cutsets = merged_ft.compute_min_cutsets(m=1000, method='classical')
+    assert len(cutsets) == len(expected)
+    for cutset in cutsets:
+        assert cutset in expected
+
+
+def test_modules():
+    """
+    Test module detection and the modular cut set computation.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c', 'd', 'e', 'f']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('top', 'and', ['g1', 'g2', 'g3'])
+    ft.add_gate('g1', 'or', ['a', 'b'])   # module
+    ft.add_gate('g2', 'or', ['c', 'g4'])  # shares g4 with g3
+    ft.add_gate('g3', 'or', ['d', 'g4'])
+    ft.add_gate('g4', 'and', ['e', 'f'])  # module
+    ft.add_gate('g5', 'or', ['c', 'd'])
+    ft.add_gate('g6', 'and', ['g2', 'g5'])
+    assert set(ft.find_modules()) == {'top', 'g1', 'g4'}
+    assert set(ft.find_modules('g6')) == {'g6', 'g4'}
+
+    expected = ft.compute_min_cutsets(m=100, method='classical')
+    cutsets = ft.compute_min_cutsets(m=100, method='classical', modular=True)
+    assert len(cutsets) == len(expected) == 4
+    for cutset in cutsets:
+        assert cutset in expected
+    assert {'a', 'e', 'f'} in cutsets
+
+    # models with repeated events
+    for path in ["models/Chinese", "models/BSCU"]:
+        ft = FaultTree.load_from_files(path)
+        expected = ft.compute_min_cutsets(m=1000, method='classical')
+        cutsets = ft.compute_min_cutsets(m=1000, method='classical',
+                                         modular=True)
+        assert len(cutsets) == len(expected)
+        for cutset in cutsets:
+            assert cutset in expected
+
+    # modules which are always True have only the empty cut set
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_house_event('on', True)
+    ft.add_gate('top', 'and', ['c', 'g'])
+    ft.add_gate('g', 'or', ['b', 'm'])
+    ft.add_gate('m', 'or', ['a', 'on'])
+    assert ft.compute_min_cutsets(m=10, method='classical',
+                                  modular=True) == [{'c'}]
+    ft.set_top_event('g')
+    assert ft.compute_min_cutsets(m=10, method='classical',
+                                  modular=True) == [set()]
+
+    # only for coherent fault trees
+    ft = FaultTree()
+    ft.set_top_event('top')
+    ft.add_basic_event('a', 0.1)
+    ft.add_gate('top', 'not', ['a'])
+    with pytest.raises(ValueError):
+        ft.compute_min_cutsets(m=10, method='classical', modular=True)
+
+
+def test_cutsets_parallel():
+    """
+    Test the parallel cut set computation against the sequential one.
+    """
+    for path in ["models/Chinese", "models/BSCU"]:
+        ft = FaultTree.load_from_files(path)
+        expected = ft.compute_min_cutsets(m=1000, method='classical')
+        cutsets = ft.compute_min_cutsets(m=1000, method='classical',
+                                         processes=2)
+        assert len(cutsets) == len(expected)
+        for cutset in cutsets:
+            assert cutset in expected
+
+    # the m smallest cut sets
+    ft = FaultTree.load_from_files("models/Chinese")
+    expected = ft.compute_min_cutsets(m=30, method='classical')
+    cutsets = ft.compute_min_cutsets(m=30, method='classical', processes=3)
+    assert [len(c) for c in cutsets] == [len(c) for c in expected]
+
+    with pytest.raises(ValueError):
+        ft.compute_min_cutsets(m=10, method='min-sat', processes=2)
+
+
+def test_iter_min_cutsets():
+    """
+    Test the generator interface for computing minimal cut sets.
+    """
+    ft = FaultTree.load_from_files("models/Chinese")
+    expected = ft.compute_min_cutsets(m=1000, method='classical')
+
+    cutsets = list(ft.iter_min_cutsets())
+    assert cutsets == expected
+    sizes = [len(c) for c in cutsets]
+    assert sizes == sorted(sizes)
+
+    # stop early
+    cutsets = []
+    for cutset in ft.iter_min_cutsets(cardinality='selector'):
+        if len(cutset) > 2:
+            break
+        cutsets.append(cutset)
+    small = [c for c in expected if len(c) <= 2]
+    assert len(cutsets) == len(small)
+    for cutset in cutsets:
+        assert cutset in small
+
+    # other methods
+    ft = FaultTree.load_from_xml("models/Theatre/theatre.xml")
+    expected = ft.compute_min_cutsets(m=10, method='classical')
+    assert list(ft.iter_min_cutsets(method='min-sat')) == expected
+
+
+def test_empty_cutset():
+    """
+    Test that the empty cut set of a top event which is always True is the
+    only cut set, and that the enumeration stops after it.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    ft.add_basic_event('a', 0.1)
+    ft.add_house_event('on', True)
+    ft.add_gate('top', 'or', ['a', 'on'])
+    for method in ['classical', 'min-sat']:
+        assert ft.compute_min_cutsets(m=10, method=method) == [set()]
+        assert list(ft.iter_min_cutsets(method)) == [set()]
+    assert ft.compute_min_cutsets(m=10, method='classical',
+                                  cardinality='selector') == [set()]
+    assert ft.compute_min_cutsets(m=10, method='classical',
+                                  processes=2) == [set()]
+    assert ft.importance()['events'] == ['a']
+    budget = Budget(seconds=60)
+    assert ft.compute_min_cutsets(m=10, method='classical',
+                                  budget=budget) == [set()]
+    assert all(budget.complete.values())
+
+    # a 'not' gate
+    ft.add_gate('not_a', 'not', ['a'])
+    ft.add_gate('top2', 'or', ['a', 'not_a'])
+    assert list(ft.iter_min_cutsets(top_event='top2')) == [set()]
+
+
+def test_cutsets_budget():
+    """
+    Test that a budget returns the cut sets found so far.
+    """
+    ft = FaultTree.load_from_files("models/Chinese")
+    expected = ft.compute_min_cutsets(m=1000, method='classical')
+
+    budget = Budget(propagations=5000)
+    cutsets = ft.compute_min_cutsets(m=1000, method='classical', budget=budget)
+    assert budget.exhausted
+    assert 0 < len(cutsets) < len(expected)
+    for cutset in cutsets:
+        assert cutset in expected
+    # orders which are complete have all their cut sets
+    for k, complete in budget.complete.items():
+        if complete:
+            assert len([c for c in cutsets if len(c) == k]) == \
+                   len([c for c in expected if len(c) == k])
+    assert False in budget.complete.values()
+
+    budget = Budget(seconds=100)
+    cutsets = ft.compute_min_cutsets(m=1000, method='classical', budget=budget)
+    assert len(cutsets) == len(expected)
+    assert not budget.exhausted
+    assert all(budget.complete.values())
+
+
+def test_most_probable_cutsets():
+    """
+    Test the probability ordered cut set computation.
+    """
+    ft = FaultTree()
+    ft.set_top_event('car breaks')
+    ft.add_basic_event('engine breaks', 0.05)
+    ft.add_basic_event('wheel breaks', 0.1)
+    ft.add_basic_event('no spare', 0.3)
+    ft.add_gate('car breaks', 'or', ['engine breaks', 'wheel issue'])
+    ft.add_gate('wheel issue', 'and', ['wheel breaks', 'no spare'])
+    cutsets = ft.compute_most_probable_cutsets(m=10)
+    assert cutsets == [{'engine breaks'}, {'wheel breaks', 'no spare'}]
+    ft.probs['engine breaks'] = 0.01
+    cutsets = ft.compute_most_probable_cutsets(m=1)
+    assert cutsets == [{'wheel breaks', 'no spare'}]
+
+    # probabilities from the basic event file
+    ft = FaultTree.load_from_files("models/Chinese")
+    assert ft.probs['e1'] == 0.02
+    prob = lambda cutset: math.prod(ft.probs[event] for event in cutset)
+    expected = ft.compute_min_cutsets(m=1000, method='classical')
+    expected = sorted([prob(c) for c in expected], reverse=True)[:50]
+    cutsets = ft.compute_most_probable_cutsets(m=50)
+    assert len(cutsets) == 50
+    for p_expected, cutset in zip(expected, cutsets):
+        assert math.isclose(prob(cutset), p_expected)
+
+    # events without a probability
+    ft = FaultTree()
+    ft.set_top_event('top')
+    ft.add_basic_event('a', 0.1)
+    ft.add_basic_event('b', None)
+    ft.add_gate('top', 'or', ['a', 'b'])
+    with pytest.raises(ValueError):
+        ft.compute_most_probable_cutsets(m=10)
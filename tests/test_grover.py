@@ -2,7 +2,18 @@
 Tests solving with Grover.
 """
 
+import itertools
+import math
+import numpy as np
+import pytest
+from qat.lang.AQASM import Program, H
+from qat.qpus import get_default_qpu
+
+from ft_2_quantum_sat.circuit import CircuitFormula
 from ft_2_quantum_sat.cnf import CNF
+from ft_2_quantum_sat.fault_tree import FaultTree
+from ft_2_quantum_sat import grover
+import ft_2_quantum_sat.myqlm_functions as myqlm
 
 def test_grover_myqlm():
     """
@@ -24,3 +35,257 @@ def test_grover_myqlm():
     sat, assignment = f.solve(method='grover')
     assert sat is True
     assert assignment == [1, -2, 3]
+
+
+def test_circuit_oracle():
+    """
+    Test that the circuit oracle and incremental oracle flip exactly the
+    phase of the satisfying assignments, and leave their ancillas in state
+    |0>.
+    """
+    ft = FaultTree()
+    ft.set_top_event('top')
+    for event in ['a', 'b', 'c', 'd']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_house_event('h', True)
+    ft.add_gate('g1', 'and', ['a', 'b'])
+    ft.add_gate('g2', 'atleast', ['b', 'c', 'd'], 2)
+    ft.add_gate('g3', 'not', ['d'])
+    ft.add_gate('g4', 'and', ['c', 'g3', 'h'])
+    ft.add_gate('top', 'or', ['g1', 'g2', 'g4'])
+    f, _ = CircuitFormula.from_fault_tree(ft)
+    f.add_cardinality_constraint(2)
+
+    n = f.num_inputs
+    program = Program()
+    qubits = program.qalloc(n)
+    for wire in qubits:
+        H(wire)
+    myqlm.oracle_from_circuit(n, f.gates, f.outputs)(qubits)
+    _check_phases(n, f.is_satisfying, program.to_circ())
+
+    # the same formula with blocking clauses added one by one
+    myqlm.clear_grover_cache()
+    for block in [[1, 2, -3, -4], [-1, 2, 3, -4]]:
+        f.block_positive_only(block)
+        oracle = myqlm.get_incremental_oracle(
+            n, 'key', lambda: myqlm.circuit_routine(n, f.gates, f.outputs))
+        circuits = oracle.circuits(f.blocked)
+        _check_phases(n, f.is_satisfying, circuits.circuits[0] + oracle.compute +
+                      oracle.parts['phase'] + oracle.uncompute)
+    assert len(oracle.terms) == 2
+    myqlm.clear_grover_cache()
+
+
+def _check_phases(n, is_satisfying, circuit):
+    """
+    Checks that `circuit` (applied to the uniform superposition of n qubits)
+    flips exactly the phase of the assignments accepted by is_satisfying().
+    """
+    result = get_default_qpu().submit(circuit.to_job())
+    amplitudes = {}
+    for sample in result:
+        bitstring = sample.state.bitstring
+        assert set(bitstring[n:]) <= {'0'} # ancillas are uncomputed
+        amplitudes[bitstring[:n]] = sample.amplitude.real * math.sqrt(2**n)
+    assert len(amplitudes) == 2**n
+    for bits in itertools.product([0, 1], repeat=n):
+        assignment = [var if bits[var - 1] else -var for var in range(1, n + 1)]
+        expected = -1 if is_satisfying(assignment) else 1
+        assert math.isclose(amplitudes[''.join(map(str, bits))], expected)
+
+
+def test_clause_oracle():
+    """
+    Test the CNF oracle with clause ancillas, with and without clause
+    batching and ancilla reuse.
+    """
+    f = CNF()
+    f.add_clauses([[1, 2], [-1, 3], [2, -3, 4], [-2, -4], [1, 4], [3, 4, -1]])
+    clauses = [list(clause) for clause in f.clauses]
+    n = f.num_vars
+
+    stats = {}
+    for batch_size, reuse in [(None, False), (2, False), (3, True), (2, True)]:
+        program = Program()
+        qubits = program.qalloc(n)
+        for wire in qubits:
+            H(wire)
+        myqlm.oracle_from_clauses(n, clauses, batch_size, reuse)(qubits)
+        circuit = program.to_circ()
+        _check_phases(n, f.is_satisfying, circuit)
+        stats[(batch_size, reuse)] = myqlm.circuit_stats(circuit)
+
+    assert stats[(None, False)]['max_controls'] == 5
+    assert stats[(2, False)]['max_controls'] == 3 # clause [2, -3, 4]
+    assert stats[(2, True)]['qubits'] < stats[(2, False)]['qubits']
+    assert stats[(2, True)]['gates'] > stats[(2, False)]['gates']
+    with pytest.raises(ValueError):
+        myqlm.oracle_from_clauses(n, clauses, batch_size=1)
+
+    # without batching, formulas with 0 or 1 clauses need no AND ancilla
+    for clauses in [[], [[1, 2]]]:
+        program = Program()
+        qubits = program.qalloc(3)
+        myqlm.cnf_routine(2, clauses)(qubits)
+        assert program.to_circ().nbqbits == 3 + len(clauses)
+    f = CNF()
+    f.add_clause([1, 2])
+    sat, assignment = f.solve(method='grover', batch_size=None)
+    assert not sat or f.is_satisfying(assignment)
+
+
+def test_cutsets_grover_circuit():
+    """
+    Test Grover search over the basic events only.
+    """
+    ft = _car_fault_tree()
+    cutsets = ft.compute_min_cutsets(5, 'grover', encoding='circuit')
+    assert cutsets == [{'engine breaks'}, {'wheel breaks', 'no spare'}]
+    cutsets = list(ft.iter_min_cutsets('grover', encoding='circuit'))
+    assert cutsets == [{'engine breaks'}, {'wheel breaks', 'no spare'}]
+    with pytest.raises(ValueError):
+        ft.compute_min_cutsets(5, 'classical', encoding='circuit')
+    with pytest.raises(ValueError):
+        next(ft.iter_min_cutsets('classical', encoding='circuit'))
+
+
+def test_grover_cache():
+    """
+    Test that oracles are compiled once per formula, and that circuits with
+    more iterations extend those with fewer.
+    """
+    myqlm.clear_grover_cache()
+    built = []
+    def build_base():
+        built.append(1)
+        return myqlm.cnf_routine(2, [[1], [-2]])
+
+    oracle = myqlm.get_incremental_oracle(2, 'key', build_base)
+    assert myqlm.get_incremental_oracle(2, 'key', build_base) is oracle
+    assert len(built) == 1
+    circuits = oracle.circuits([])
+    one, three = circuits.circuit(1), circuits.circuit(3)
+    assert list(circuits.circuits) == [0, 1, 3]
+    assert len(three.ops) == len(one.ops) + 2 * len(circuits.iteration.ops)
+    assert circuits.circuit(2) is circuits.circuits[2]
+
+    # only the most recently used circuits are kept
+    for r in range(4, 4 + myqlm.CIRCUITS_PER_ORACLE):
+        circuits.circuit(r)
+    assert len(circuits.circuits) == myqlm.CIRCUITS_PER_ORACLE + 1
+    assert 0 in circuits.circuits and 1 not in circuits.circuits
+    assert len(circuits.circuit(1).ops) == len(one.ops)
+
+    myqlm.get_incremental_oracle(2, 'other key', build_base)
+    assert len(built) == 2
+    myqlm.clear_grover_cache()
+
+
+def test_grover_blocking():
+    """
+    Test that blocking clauses are added to the oracle of the other clauses
+    as separate terms.
+    """
+    myqlm.clear_grover_cache()
+    f = CNF()
+    f.add_clause([1, 2])
+    f.block_positive_only([1, -2])
+    sat, assignment = f.solve(method='grover')
+    assert sat is True
+    assert assignment == [-1, 2]
+
+    g = f.copy()
+    g.block_positive_only(assignment)
+    sat, _ = g.solve(method='grover')
+    assert sat is False
+    key = (frozenset([frozenset([1, 2])]), 4, True)
+    oracle = myqlm.get_incremental_oracle(2, key, None)
+    assert list(oracle.terms) == [(1,), (2,)]
+    myqlm.clear_grover_cache()
+
+
+def test_grover_oracle_options(capsys):
+    """
+    Test that the clause batching is passed down to the oracle, and that the
+    statistics of the circuits are printed with `verbose`.
+    """
+    myqlm.clear_grover_cache()
+    ft = FaultTree()
+    ft.set_top_event('top')
+    ft.add_basic_event('a', 0.1)
+    ft.add_basic_event('b', 0.2)
+    ft.add_gate('top', 'or', ['a', 'b'])
+    cutsets = ft.compute_min_cutsets(
+        5, 'grover', grover_options={'batch_size': 3, 'verbose': True})
+    assert sorted(cutsets, key=sorted) == [{'a'}, {'b'}]
+    assert 'max_controls' in capsys.readouterr().out
+    keys = [key[2][1:] for key in myqlm._GROVER_CACHE]
+    assert keys == [(3, True)] * len(keys)
+
+    ft.compute_min_cutsets(5, 'grover')
+    assert capsys.readouterr().out == ''
+    myqlm.clear_grover_cache()
+
+
+def test_satisfying_mask():
+    """
+    Test the vectorised evaluation of formulas over all assignments.
+    """
+    f = CNF()
+    f.add_clauses([[1, 2], [-1, 3], [2, -3, 4]])
+    f.block_positive_only([1, 2, 3, -4])
+    g, _ = CircuitFormula.from_fault_tree(_car_fault_tree())
+    g.add_cardinality_constraint(2)
+    g.block_positive_only([1, -2, -3])
+
+    for formula in [f, g]:
+        n = formula.num_vars
+        mask = formula.satisfying_mask()
+        assert mask.shape == (2**n,)
+        for i in range(2**n):
+            assignment = [var if (i >> (var - 1)) & 1 else -var
+                          for var in range(1, n + 1)]
+            assert mask[i] == formula.is_satisfying(assignment)
+
+
+def test_numpy_backend():
+    """
+    Test that the NumPy backend matches the MyQLM simulation, and finds the
+    same cut sets.
+    """
+    f = CNF()
+    f.add_clauses([[1, 2], [-1, 3], [2, -3, 4], [-2, -4]])
+    numpy_backend = grover.NumpyBackend(seed=0)
+    for r in [1, 2]:
+        assert np.allclose(numpy_backend.probabilities(f, r),
+                           grover.MyQLMBackend().probabilities(f, r))
+
+    sat, assignment = f.solve(method='grover', backend=numpy_backend)
+    assert sat is True
+    assert f.is_satisfying(assignment)
+
+    ft = _car_fault_tree()
+    for encoding in ['tseitin', 'circuit']:
+        cutsets = ft.compute_min_cutsets(
+            5, 'grover', encoding=encoding,
+            grover_options={'backend': numpy_backend})
+        assert cutsets == [{'engine breaks'}, {'wheel breaks', 'no spare'}]
+    cutsets = list(ft.iter_min_cutsets(
+        'grover', grover_options={'backend': numpy_backend}))
+    assert cutsets == [{'engine breaks'}, {'wheel breaks', 'no spare'}]
+
+    # formulas with too many variables are rejected
+    with pytest.raises(ValueError):
+        f.satisfying_mask(max_vars=3)
+
+
+def _car_fault_tree():
+    ft = FaultTree()
+    ft.set_top_event('car breaks')
+    ft.add_basic_event('engine breaks', 0.05)
+    ft.add_basic_event('wheel breaks', 0.1)
+    ft.add_basic_event('no spare', 0.3)
+    ft.add_gate('car breaks', 'or', ['engine breaks', 'wheel issue'])
+    ft.add_gate('wheel issue', 'and', ['wheel breaks', 'no spare'])
+    return ft
@@ -0,0 +1,116 @@
+"""
+Tests for the quantification module.
+"""
+
+import math
+import numpy as np
+
+from ft_2_quantum_sat.fault_tree import FaultTree
+from ft_2_quantum_sat.quantification import CutSetMatrix, importance, quantify
+
+
+def test_cutset_matrix():
+    """
+    Test the sparse incidence matrix of a list of cut sets.
+    """
+    cutsets = [{'a', 'b'}, {'c'}, set(), {'a', 'c', 'd'}]
+    matrix = CutSetMatrix(cutsets)
+    assert matrix.events == ['a', 'b', 'c', 'd']
+    assert matrix.num_cutsets == 4
+    assert matrix.num_events == 4
+    assert list(matrix.indptr) == [0, 2, 3, 3, 6]
+    for i, cutset in enumerate(cutsets):
+        row = matrix.indices[matrix.indptr[i]:matrix.indptr[i+1]]
+        assert {matrix.events[j] for j in row} == cutset
+
+    probs = matrix.event_probabilities({'a': 0.1, 'b': 0.2, 'c': 0.5,
+                                        'd': 0.4})
+    assert np.allclose(matrix.cutset_probabilities(probs),
+                       [0.02, 0.5, 1.0, 0.02])
+
+
+def test_quantify():
+    """
+    Test the rare event approximation, min-cut upper bound and contributions.
+    """
+    ft = FaultTree()
+    ft.set_top_event('car breaks')
+    ft.add_basic_event('engine breaks', 0.05)
+    ft.add_basic_event('wheel breaks', 0.1)
+    ft.add_basic_event('no spare', 0.3)
+    ft.add_gate('car breaks', 'or', ['engine breaks', 'wheel issue'])
+    ft.add_gate('wheel issue', 'and', ['wheel breaks', 'no spare'])
+    cutsets = ft.compute_min_cutsets(m=10, method='classical')
+
+    res = ft.quantify(cutsets)
+    assert math.isclose(res['rare_event'], 0.05 + 0.03)
+    assert math.isclose(res['mcub'], 1 - 0.95 * 0.97)
+    assert sorted(res['contributions']) == [0.375, 0.625]
+
+    # N samples per event give N results
+    probs = {'engine breaks': np.array([0.05, 0.1, 0.0]),
+             'wheel breaks': 0.1, 'no spare': np.array([0.3, 0.3, 0.0])}
+    res = quantify(cutsets, probs)
+    assert res['cutset_probabilities'].shape == (2, 3)
+    assert np.allclose(res['rare_event'], [0.08, 0.13, 0.0])
+    assert np.allclose(res['contributions'][:, 2], 0.0)
+
+    # many cut sets
+    ft = FaultTree.load_from_files("models/Chinese")
+    cutsets = ft.compute_min_cutsets(m=1000, method='classical')
+    res = ft.quantify(cutsets * 100)
+    expected = sum(math.prod(ft.probs[e] for e in c) for c in cutsets) * 100
+    assert math.isclose(res['rare_event'], expected)
+    assert res['mcub'] <= res['rare_event']
+    assert math.isclose(np.sum(res['contributions']), 1.0)
+
+
+def test_importance():
+    """
+    Test the importance measures against quantifying with changed
+    probabilities.
+    """
+    cutsets = [{'a', 'b'}, {'c'}, {'a', 'd'}]
+    probs = {'a': 0.1, 'b': 0.2, 'c': 0.05, 'd': 0.0}
+    res = importance(cutsets, probs)
+    assert res['events'] == ['a', 'b', 'c', 'd']
+
+    q = quantify(cutsets, probs)['rare_event']
+    for i, event in enumerate(res['events']):
+        q_failed = quantify(cutsets, {**probs, event: 1.0})['rare_event']
+        q_perfect = quantify(cutsets, {**probs, event: 0.0})['rare_event']
+        assert math.isclose(res['fussell_vesely'][i], (q - q_perfect) / q)
+        assert math.isclose(res['birnbaum'][i], q_failed - q_perfect)
+        assert math.isclose(res['raw'][i], q_failed / q)
+        assert math.isclose(res['rrw'][i], q / q_perfect)
+
+    # the same for N samples
+    samples = {'a': np.array([0.1, 0.3]), 'b': 0.2, 'c': 0.05,
+               'd': np.array([0.0, 0.5])}
+    res_samples = importance(cutsets, samples)
+    assert res_samples['raw'].shape == (4, 2)
+    for measure in ['fussell_vesely', 'birnbaum', 'raw', 'rrw']:
+        assert np.allclose(res_samples[measure][:, 0], res[measure])
+
+    # from a fault tree, events outside of the cut sets are included
+    ft = FaultTree.load_from_files("models/Chinese")
+    res = ft.importance()
+    assert res['events'] == sorted(ft.basic_events)
+    assert np.all(res['fussell_vesely'] <= 1.0)
+    assert np.all(res['raw'] >= 1.0)
+    assert np.all(res['rrw'] >= 1.0)
+
+    # the default top event is resolved like a given one, also if it was
+    # removed by simplification
+    ft = FaultTree()
+    for event in ['a', 'b', 'c']:
+        ft.add_basic_event(event, 0.1)
+    ft.add_gate('top', 'and', ['g'])
+    ft.add_gate('g', 'or', ['a', 'b'])
+    ft.set_top_event('top')
+    simple_ft = ft.simplify()
+    simple_ft.set_top_event('top')
+    res = simple_ft.importance(cutsets=[{'a'}, {'b'}])
+    assert res['events'] == ['a', 'b']
+    assert simple_ft.importance(cutsets=[{'a'}, {'b'}],
+                                top_event='top')['events'] == ['a', 'b']
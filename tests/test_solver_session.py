@@ -0,0 +1,141 @@
+"""
+Tests for the solver_session module.
+"""
+
+from pysat.examples.genhard import PHP
+
+from ft_2_quantum_sat.cnf import CNF
+from ft_2_quantum_sat.solver_session import Budget, MaxSATSession, SATSession
+
+def test_session_blocking():
+    """
+    Test that blocking clauses are pushed into the live solver and the formula.
+    """
+    # F = (x1 v x2), enumerate the positive parts of its models
+    f = CNF()
+    f.add_clause([1, 2])
+    found = []
+    with SATSession(f) as session:
+        sat, model = session.solve()
+        while sat:
+            found.append({lit for lit in model if lit > 0})
+            session.block_positive_only(model)
+            sat, model = session.solve()
+
+    # both minimal models are found, and nothing is found twice
+    assert {1} in found
+    assert {2} in found
+    assert len(found) <= 3
+    assert len(f.clauses) == 1 + len(found)
+
+
+def test_session_cardinality_selector():
+    """
+    Test cardinality constraints which are switched on by assumptions.
+    """
+    # F = (x1) ^ (x2) ^ (x3 v x4)
+    f = CNF()
+    f.add_clause([1])
+    f.add_clause([2])
+    f.add_clause([3, 4])
+    with SATSession(f) as session:
+        at_most_2 = session.add_cardinality_constraint(2, [1, 2, 3, 4])
+        at_most_3 = session.add_cardinality_constraint(3, [1, 2, 3, 4])
+
+        sat, _ = session.solve(assumptions=[at_most_2])
+        assert sat is False
+        sat, model = session.solve(assumptions=[at_most_3])
+        assert sat is True
+        assert len([lit for lit in model[:4] if lit > 0]) <= 3
+
+        # without the selector the constraint is not active
+        session.retire(at_most_2)
+        sat, _ = session.solve()
+        assert sat is True
+
+
+def test_session_totalizer_bound():
+    """
+    Test moving the cardinality bound of the totalizer through assumptions.
+    """
+    # F = (x1) ^ (x2) ^ (x3 v x4)
+    f = CNF()
+    f.add_clause([1])
+    f.add_clause([2])
+    f.add_clause([3, 4])
+    with SATSession(f) as session:
+        sat, _ = session.solve(session.cardinality_bound(2, [1, 2, 3, 4]))
+        assert sat is False
+        sat, model = session.solve(session.cardinality_bound(3, [1, 2, 3, 4]))
+        assert sat is True
+        assert len([lit for lit in model[:4] if lit > 0]) <= 3
+
+        # tightening the bound again only changes the assumptions
+        sat, _ = session.solve(session.cardinality_bound(1, [1, 2, 3, 4]))
+        assert sat is False
+
+        # a bound >= the number of variables needs no assumptions at all
+        assert session.cardinality_bound(4, [1, 2, 3, 4]) == []
+
+
+def test_budget():
+    """
+    Test conflict and time budgets on a hard (pigeonhole) formula.
+    """
+    f = CNF()
+    php = PHP(8)
+    f.add_clauses([[abs(lit) for lit in php.clauses[0]]]) # declare the vars
+    f.add_clauses(php.clauses)
+
+    # per call conflict limit, the budget of the run is not used up
+    budget = Budget(call_conflicts=100)
+    with SATSession(f) as session:
+        sat, model = session.solve(budget=budget)
+    assert sat is None and model is None
+    assert budget.exhausted
+    assert 100 <= budget.conflicts_used < 1000
+
+    # the conflicts of earlier calls count towards the limit of the run
+    budget = Budget(conflicts=150, call_conflicts=100)
+    sat, _ = f.solve(budget=budget)
+    assert sat is None
+    sat, _ = f.solve(budget=budget)
+    assert sat is None
+    assert budget.expired()
+
+    # time limit
+    budget = Budget(call_seconds=0.2)
+    sat, _ = f.solve(method='min-sat', budget=budget)
+    assert sat is None
+    assert budget.exhausted
+
+    # easy formulas are solved as usual
+    budget = Budget(seconds=10, conflicts=1000)
+    sat, _ = CNF().solve(budget=budget)
+    assert sat is True
+    assert not budget.exhausted
+
+
+def test_maxsat_session():
+    """
+    Test that the MaxSAT session returns the smallest unblocked solutions.
+    """
+    # F = (x1 v x2) ^ (x1 v x3) ^ (x4), minimize the number of True vars
+    f = CNF()
+    f.add_clause([1, 2, 3, 4])
+    f.add_clause([1, 2])
+    f.add_clause([1, 3])
+    f.add_clause([4])
+    num_clauses = len(f.clauses)
+    with MaxSATSession(f, {-var: 1 for var in f.get_vars()}) as session:
+        sat, model = session.solve()
+        assert sat is True
+        assert model[:4] == [1, -2, -3, 4]
+        session.block_positive_only(model[:4])
+        sat, model = session.solve()
+        assert sat is True
+        assert model[:4] == [-1, 2, 3, 4]
+        session.block_positive_only(model[:4])
+        sat, model = session.solve()
+        assert sat is False and model is None
+    assert len(f.clauses) == num_clauses + 2